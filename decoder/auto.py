@@ -0,0 +1,131 @@
+import logging
+from typing import NamedTuple
+
+from decoder import bahn, girocard, iso4909, registry  # Registers the formats
+from decoder.baseparser import BaseParser
+from decoder.baseprinter import BasePrinter
+from decoder.raw import iso7813
+
+logger = logging.getLogger(__name__)
+
+SEPARATORS = {"%": "^", ";": "="}  # Field separator per start sentinel
+MAX_GAP = 32  # Longer gaps between the first two separators are not told apart
+
+
+class Detected(NamedTuple):
+    format: str  # Name of the processor that parsed the track
+    details: object  # Its parser result for the track
+
+
+def _decide(trackno: int, sentinel: str, gap: int, numeric: bool) -> str:
+    """Decides the format of a track by its start sentinel and the first field
+    after the first separator: its length (gap to the next separator, 0 if
+    there is none) and whether it is all digits.
+    """
+    if trackno in (1, 2) and sentinel == "%;"[trackno - 1]:
+        # Bahncard: number, then valid start (YYYYMMDD) between separators
+        if gap == 9 and numeric:
+            return "bahn"
+        return "iso7813"
+    if trackno == 3 and sentinel == ";" and numeric:
+        if gap == 12:  # Account number and check digit after the routing code
+            return "girocard"
+        if gap == 4:  # Country code after the PAN
+            return "iso4909"
+    return None
+
+
+def _build_table() -> dict:
+    """Returns the decision table, (trackno, sentinel, gap, numeric) -> name,
+    for all combinations with a known format.
+    """
+    table = {}
+    for trackno in (1, 2, 3):
+        for sentinel in SEPARATORS:
+            for gap in range(MAX_GAP + 1):
+                for numeric in (False, True):
+                    name = _decide(trackno, sentinel, gap, numeric)
+                    if name is not None:
+                        table[(trackno, sentinel, gap, numeric)] = name
+    return table
+
+
+TABLE = _build_table()
+
+
+def _fields() -> dict:
+    """Returns the names of the fields per track, of all formats the track
+    can be detected as.
+    """
+    fields = {}
+    for ((trackno, *_), name) in sorted(TABLE.items()):
+        names = registry.get(trackno, name).fields.get(trackno, ())
+        fields[trackno] = tuple(dict.fromkeys(fields.get(trackno, ()) + names))
+    return fields
+
+
+def classify(trackno: int, data: str) -> str:
+    """Returns the name of the processor for the track data, None if the
+    format is unknown.
+    """
+    sentinel = data[:1]
+    separator = SEPARATORS.get(sentinel)
+    if separator is None:
+        return None
+    first = data.find(separator)
+    second = data.find(separator, first + 1) if first >= 0 else -1
+    if second < 0:
+        (gap, numeric) = (0, False)
+    else:
+        gap = min(second - first, MAX_GAP)
+        numeric = data[first + 1:second].isdigit()
+    return TABLE.get((trackno, sentinel, gap, numeric))
+
+
+class Parser(BaseParser):
+    """Detects the format of each track and parses it with that processor."""
+
+    def __init__(self) -> None:
+        self._parsers = {}
+
+    def process_trackdata(self, trackdata: tuple) -> tuple:
+        track_details = [None, None, None]
+        for (trackno, data) in enumerate(trackdata, 1):
+            if data is None:
+                continue
+            name = classify(trackno, data)
+            if name is None:
+                logger.warn("Unknown track %d format: '%s'", trackno, data)
+                continue
+            logger.debug("Track %d detected as %s", trackno, name)
+            if name not in self._parsers:
+                self._parsers[name] = registry.get(trackno, name).parser()
+            trackdata_copy = [None, None, None]
+            trackdata_copy[trackno - 1] = data
+            details = self._parsers[name].process_trackdata(tuple(trackdata_copy))[trackno - 1]
+            if details is not None:
+                track_details[trackno - 1] = Detected(name, details)
+        return tuple(track_details)
+
+
+class Printer(BasePrinter):
+    """Prints each track with the printer of its detected format."""
+
+    def __init__(self, print_verbose=False) -> None:
+        super().__init__(print_verbose)
+        self._printers = {}
+
+    def print_trackdata(self, track_details: tuple):
+        for (trackno, detected) in enumerate(track_details, 1):
+            if detected is None:
+                continue
+            if detected.format not in self._printers:
+                printer = registry.get(trackno, detected.format).printer
+                self._printers[detected.format] = printer(print_verbose=self._print_verbose)
+            print(f"Track {trackno} format: {detected.format}")
+            track_details_copy = [None, None, None]
+            track_details_copy[trackno - 1] = detected.details
+            self._printers[detected.format].print_trackdata(tuple(track_details_copy))
+
+
+registry.register("auto", (1, 2, 3), Parser, Printer, _fields())
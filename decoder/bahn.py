@@ -1,14 +1,62 @@
 import logging
-import re
-from datetime import datetime
 
+from decoder import registry
 from decoder.baseparser import BaseParser
 from decoder.baseprinter import BasePrinter
+from decoder.fieldspec import (DateField, FieldError, Fields, FieldSpec, Fixed,
+                               Lit, StrField, Var)
 from decoder.utils import check_luhn
 
 logger = logging.getLogger(__name__)
 
 
+class Track1Details(Fields):
+    """Bahncard track 1 fields, with typed accessors."""
+
+    __slots__ = ()
+    CONSTANTS = {"trackno": 1}  # inline signal track
+    number = StrField("BCNR")
+    valid_from = DateField("VS", "%Y%m%d")
+    valid_until = DateField("VE", "%Y%m%d")
+    marker = StrField("MARK")
+
+
+class Track2Details(Fields):
+    """Bahncard track 2 fields, with typed accessors."""
+
+    __slots__ = ()
+    CONSTANTS = {"trackno": 2}
+    number = StrField("BCNR")
+    valid_from = DateField("VS", "%Y%m%d")
+    valid_until = DateField("VE", "%Y%m%d")
+
+
+TRACK1_FORMAT = FieldSpec([
+    Lit("%"),
+    Fixed("FC", 1, "A-Z"),  # Format code
+    Var("BCNR", 1, 19),  # Bahncard number
+    Lit("^"),
+    Fixed("VS", 8),  # Valid start
+    Lit("^"),
+    Fixed("VE", 8),  # Valid end
+    Lit("^"),
+    Var("MARK", 1, None, r"^\^"),  # Marker HK Hauptkarte, PK Partnerkarte
+    Lit("^"),
+    Var("AD", chars=r"^?"),  # Additional data
+    Lit("?"),
+], Track1Details)
+TRACK2_FORMAT = FieldSpec([
+    Lit(";"),
+    Var("BCNR", 1, 19),  # Bahncard number
+    Lit("="),
+    Fixed("VS", 8),  # Valid start
+    Lit("="),
+    Fixed("VE", 8),  # Valid end
+    Var("AD", chars=r"^?"),  # Additional data
+    Lit("?"),
+], Track2Details)
+
+
 class Printer(BasePrinter):
     def print_trackdata(self, track_details: tuple):
         for (trackno, data) in enumerate(track_details, 1):
@@ -23,19 +71,15 @@ class Printer(BasePrinter):
             if trackno == 1:
                 print(f"Bahncard number: {
                       data['BCNR']} (valid: {check_luhn(data['BCNR'])})")
-                print(f"Valid from:  {
-                      datetime.strptime(data['VS'], '%Y%m%d')}")
-                print(f"Valid until: {
-                      datetime.strptime(data['VE'], '%Y%m%d')}")
+                print(f"Valid from:  {data.valid_from}")
+                print(f"Valid until: {data.valid_until}")
                 print(f"Marker:      {data['MARK']}")
                 print(f"Additional:  {data['AD']}")
             elif trackno == 2:
                 print(f"Bahncard number: {
                       data['BCNR']} (valid: {check_luhn(data['BCNR'])})")
-                print(f"Valid from:  {
-                      datetime.strptime(data['VS'], '%Y%m%d')}")
-                print(f"Valid until: {
-                      datetime.strptime(data['VE'], '%Y%m%d')}")
+                print(f"Valid from:  {data.valid_from}")
+                print(f"Valid until: {data.valid_until}")
 
 
 class Parser(BaseParser):
@@ -46,33 +90,20 @@ class Parser(BaseParser):
                 print(f"No details for track {trackno}")
                 continue
             if trackno == 1:
-                matcher = re.match(
-                    r"^%(?P<FC>[A-Z])(?P<BCNR>[0-9]{1,19})\^(?P<VS>[0-9]{8})\^(?P<VE>[0-9]{8})\^(?P<MARK>[^\^]{1,})\^(?P<AD>[^\?]*)\?$", data)
-                if not matcher:
-                    logger.warn("Non-Bahncard track 1 format: '%s'", data)
+                try:
+                    result = TRACK1_FORMAT.parse(data)
+                except FieldError as e:
+                    logger.warn("Non-Bahncard track 1 format, %s: '%s'", e, data)
                     continue
-                result = {
-                    "trackno": trackno,  # inline signal track
-                    "FC": matcher.group("FC"),  # Format code
-                    "BCNR": matcher.group("BCNR"),  # Bahncard numner
-                    "VS": matcher.group("VS"),  # Valid start
-                    "VE": matcher.group("VE"),  # Valid end
-                    # Marker HK Hauptkarte, PK Partnerkarte
-                    "MARK": matcher.group("MARK"),
-                    "AD": matcher.group("AD"),  # Additional data
-                }
             elif trackno == 2:
-                matcher = re.match(
-                    r"^\;(?P<BCNR>[0-9]{1,19})\=(?P<VS>[0-9]{8})\=(?P<VE>[0-9]{8})(?P<AD>[^\?]*)\?$", data)
-                if not matcher:
-                    logger.warn("Non-Bahncard track 2 format: '%s'", data)
+                try:
+                    result = TRACK2_FORMAT.parse(data)
+                except FieldError as e:
+                    logger.warn("Non-Bahncard track 2 format, %s: '%s'", e, data)
                     return tuple(track_details)
-                result = {
-                    "trackno": trackno,  # inline signal track
-                    "BCNR": matcher.group("BCNR"),  # Bahncard numner
-                    "VS": matcher.group("VS"),  # Valid start
-                    "VE": matcher.group("VE"),  # Valid end
-                }
             logger.debug("Bahncard track %d data: %s", trackno, data)
             track_details[trackno - 1] = result
         return tuple(track_details)
+
+
+registry.register("bahn", (1, 2, 3), Parser, Printer, {1: TRACK1_FORMAT.names, 2: TRACK2_FORMAT.names})
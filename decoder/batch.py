@@ -0,0 +1,51 @@
+import collections
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class SwipeResult(NamedTuple):
+    index: int  # Position of the swipe in the capture
+    trackdata: tuple  # The decoded data from the tracks
+    track_details: tuple  # Parser result per track, None if not parsed
+    error: str  # Set if decoding or parsing the swipe failed
+
+
+def decode_swipe(decoder, parsers: tuple, index: int, bitstring: str) -> SwipeResult:
+    """Decodes and parses a single swipe. Errors are returned in the result
+    instead of raised, so one bad swipe does not abort a batch.
+    """
+    try:
+        trackdata = decoder.decode_bitstring(bitstring)
+        if not isinstance(trackdata, tuple):
+            return SwipeResult(index, None, None, "No sync found")
+        track_details = [None, None, None]
+        for (trackno, parser) in enumerate(parsers, 1):
+            if parser is None or trackdata[trackno - 1] is None:
+                continue
+            trackdata_copy = [None, None, None]
+            trackdata_copy[trackno - 1] = trackdata[trackno - 1]
+            track_details[trackno - 1] = parser.process_trackdata(tuple(trackdata_copy))
+        return SwipeResult(index, trackdata, tuple(track_details), None)
+    except Exception as e:
+        logger.debug("Swipe %d failed: %s", index, e)
+        return SwipeResult(index, None, None, f"{e}")
+
+
+def decode_swipes(swipes, decoder, parsers: tuple, jobs: int = None):
+    """Decodes and parses the swipes (an iterable of bitstrings) on a process
+    pool and yields a SwipeResult per swipe in capture order. At most a few
+    swipes per worker are in flight, so captures of any length can be fed.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for (index, bitstring) in enumerate(swipes):
+            pending.append(executor.submit(decode_swipe, decoder, parsers, index, bitstring))
+            if len(pending) >= jobs * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,171 @@
+import csv
+import json
+import logging
+from collections.abc import Mapping
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from decoder import auto, registry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1024  # Rows buffered before they are written
+BUFFER_SIZE = 1 << 16  # Bytes buffered by the text sinks
+KEYS = ("swipe", "trackno", "format")  # Columns of every row, before the fields
+
+
+def schema(selection: tuple) -> tuple:
+    """Returns the columns for the processor names selected per track: the
+    keys, then the fields of the processors in track order.
+    """
+    columns = dict.fromkeys(KEYS)
+    for (trackno, name) in enumerate(selection, 1):
+        processor = None if name is None else registry.get(trackno, name)
+        if processor is not None:
+            columns.update(dict.fromkeys(processor.fields.get(trackno, ())))
+    return tuple(columns)
+
+
+def rows(swipe: int, selection: tuple, track_details: tuple):
+    """Yields a row per parsed track of a swipe, with the fields of its
+    format only.
+    """
+    for (trackno, (name, details)) in enumerate(zip(selection, track_details), 1):
+        if details is None:
+            continue
+        if isinstance(details, auto.Detected):
+            (name, details) = (details.format, details.details)
+        row = {"swipe": swipe, "trackno": trackno, "format": name}
+        if isinstance(details, Mapping):
+            row.update(details)
+        else:
+            row["data"] = details  # Not parsed, e.g. noop
+        yield row
+
+
+class Sink:
+    """Writes the parser results of swipes as rows of the schema of the
+    selected processors. Rows are buffered and written in batches, call
+    close() to write the last one.
+    """
+
+    def __init__(self, path: str, selection: tuple, batch_size: int = BATCH_SIZE) -> None:
+        self.path = path
+        self.selection = tuple(selection)
+        self.columns = schema(self.selection)
+        self.count = 0  # Rows written
+        self._batch_size = batch_size
+        self._rows = []
+        self._swipes = 0
+
+    def write_swipe(self, track_details: tuple, swipe: int = None) -> None:
+        """Adds the tracks of a swipe, numbered in arrival order if swipe is
+        not given.
+        """
+        if swipe is None:
+            swipe = self._swipes
+        self._swipes = swipe + 1
+        self._rows.extend(rows(swipe, self.selection, track_details))
+        if len(self._rows) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        self._write_batch(self._rows)
+        self.count += len(self._rows)
+        self._rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self._close()
+        logger.debug("Exported %d rows to %s", self.count, self.path)
+
+    def _write_batch(self, batch: list) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        raise NotImplementedError
+
+
+class JsonlSink(Sink):
+    """One JSON object per line, with the fields of the track format only."""
+
+    def __init__(self, path: str, selection: tuple, batch_size: int = BATCH_SIZE) -> None:
+        super().__init__(path, selection, batch_size)
+        self._fh = open(path, "w", encoding="utf-8", buffering=BUFFER_SIZE)
+
+    def _write_batch(self, batch: list) -> None:
+        self._fh.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch))
+
+    def _close(self) -> None:
+        self._fh.close()
+
+
+class CsvSink(Sink):
+    """A header of all columns, fields not in the track format are empty."""
+
+    def __init__(self, path: str, selection: tuple, batch_size: int = BATCH_SIZE) -> None:
+        super().__init__(path, selection, batch_size)
+        self._fh = open(path, "w", encoding="utf-8", newline="", buffering=BUFFER_SIZE)
+        self._writer = csv.DictWriter(self._fh, self.columns, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def _write_batch(self, batch: list) -> None:
+        self._writer.writerows(batch)
+
+    def _close(self) -> None:
+        self._fh.close()
+
+
+class ArrowSink(Sink):
+    """An Arrow IPC file of record batches, the fields are string columns.
+    Requires pyarrow.
+    """
+
+    def __init__(self, path: str, selection: tuple, batch_size: int = BATCH_SIZE) -> None:
+        super().__init__(path, selection, batch_size)
+        if pa is None:
+            raise ImportError(f"{type(self).__name__} requires pyarrow")
+        types = {"swipe": pa.int64(), "trackno": pa.int8()}
+        self._schema = pa.schema([(column, types.get(column, pa.string())) for column in self.columns])
+        self._writer = self._open_writer()
+
+    def _open_writer(self):
+        return pa.ipc.new_file(self.path, self._schema)
+
+    def _write_batch(self, batch: list) -> None:
+        columns = {}
+        for field in self._schema:
+            values = [row.get(field.name) for row in batch]
+            if pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            columns[field.name] = values
+        self._writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=self._schema))
+
+    def _close(self) -> None:
+        self._writer.close()
+
+
+class ParquetSink(ArrowSink):
+    """A Parquet file, a row group per batch. Requires pyarrow."""
+
+    def _open_writer(self):
+        return pq.ParquetWriter(self.path, self._schema)
+
+
+SINKS = {"jsonl": JsonlSink, "csv": CsvSink, "arrow": ArrowSink, "parquet": ParquetSink}
+
+
+def open_sink(kind: str, path: str, selection: tuple) -> Sink:
+    """Returns the sink of the kind for the processor names selected per
+    track.
+    """
+    sink = SINKS.get(kind)
+    if sink is None:
+        raise ValueError(f"Unsupported export format: {kind}")
+    return sink(path, selection)
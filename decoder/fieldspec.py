@@ -0,0 +1,273 @@
+import re
+from collections.abc import Mapping
+from datetime import datetime
+
+DIGITS = "0-9"  # Character classes as in a regex set
+
+# Parse steps
+LITERAL = 0
+BLOCK = 1  # Consecutive fixed fields without alternatives
+FIELD = 2
+
+
+class FieldError(ValueError):
+    """Raised if the data does not fit the spec, at the first field that
+    does not.
+    """
+
+    def __init__(self, position: int, field: str, expected: str) -> None:
+        super().__init__(f"{field} expected {expected} at position {position}")
+        self.position = position
+        self.field = field
+        self.expected = expected
+
+
+class Field:
+    """A field of a spec, use Lit(), Fixed() or Var() to declare one."""
+
+    __slots__ = ("name", "chars", "run", "min_len", "max_len", "expected", "optional", "marker", "literal",
+                 "variable")
+
+    def __init__(self, name: str, chars: str, min_len: int, max_len: int, expected: str, optional: bool = False,
+                 marker: str = None, literal: str = None, variable: bool = False) -> None:
+        self.name = name  # None for literals, they are not stored
+        self.chars = chars
+        self.run = re.compile(f"[{chars}]*") if chars is not None else None  # Characters the field may take
+        self.min_len = min_len
+        self.max_len = max_len  # None for no limit
+        self.expected = expected
+        self.optional = optional  # Skipped if the data does not fit
+        self.marker = marker  # Stands in for the field, e.g. "=" for "not present"
+        self.literal = literal
+        self.variable = variable
+
+
+def Lit(text: str) -> Field:
+    """A literal, e.g. a sentinel or field separator."""
+    return Field(None, None, len(text), len(text), repr(text), literal=text)
+
+
+def Fixed(name: str, width: int, chars: str = DIGITS, optional: bool = False, marker: str = None) -> Field:
+    """A field of exactly width characters out of chars."""
+    return Field(name, chars, width, width, f"{width} of [{chars}]", optional, marker)
+
+
+def Var(name: str, min_len: int = 0, max_len: int = None, chars: str = DIGITS,
+        optional: bool = False, marker: str = None) -> Field:
+    """A field of min_len up to max_len characters out of chars, as many as
+    there are. Usually ended by a separator not in chars.
+    """
+    limit = "" if max_len is None else max_len
+    return Field(name, chars, min_len, max_len, f"{min_len}-{limit or 'n'} of [{chars}]",
+                 optional, marker, variable=True)
+
+
+class Fields(Mapping):
+    """The fields of a parsed track, readable like a dict. Only the positions
+    of the fields are kept, a value is sliced from the data when it is
+    accessed. Absent optional fields are None. Subclasses per track format
+    add typed accessors and constant values, e.g. the track number.
+    """
+
+    __slots__ = ("_data", "_index", "_offsets", "_extra")
+    CONSTANTS = {}  # Values of all records of the type
+
+    def __init__(self, data: str, index: dict, offsets, extra: dict = None) -> None:
+        self._data = data
+        self._index = index  # Field name -> number, shared by the spec
+        self._offsets = offsets  # Start + 1 and end + 1 per field, 0 if absent
+        self._extra = extra or None  # Values not taken from the data
+
+    def span(self, name: str) -> tuple:
+        """Returns (start, end) of the field in the data, None if absent."""
+        i = self._index[name] * 2
+        start = self._offsets[i]
+        return None if start == 0 else (start - 1, self._offsets[i + 1] - 1)
+
+    def __getitem__(self, name: str):
+        i = self._index.get(name)
+        if i is None:
+            if self._extra is not None and name in self._extra:
+                return self._extra[name]
+            return self.CONSTANTS[name]
+        start = self._offsets[i * 2]
+        return None if start == 0 else self._data[start - 1:self._offsets[i * 2 + 1] - 1]
+
+    def __iter__(self):
+        yield from self.CONSTANTS
+        if self._extra is not None:
+            yield from self._extra
+        yield from self._index
+
+    def __len__(self) -> int:
+        return len(self.CONSTANTS) + len(self._extra or ()) + len(self._index)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class StrField:
+    """Accessor of a record for a field value, None if absent or not in the
+    track format.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __get__(self, record: Fields, owner: type = None):
+        if record is None:
+            return self
+        return record.get(self.name)
+
+
+class IntField(StrField):
+    """Accessor of a record for a numeric field, converted when read. None if
+    absent or a marker.
+    """
+
+    def __get__(self, record: Fields, owner: type = None):
+        if record is None:
+            return self
+        value = record.get(self.name)
+        return int(value) if value and value.isdigit() else None
+
+
+class DateField(StrField):
+    """Accessor of a record for a date field in the strptime() format,
+    converted when read. None if absent, a marker or not a date.
+    """
+
+    def __init__(self, name: str, date_format: str) -> None:
+        super().__init__(name)
+        self.date_format = date_format
+
+    def __get__(self, record: Fields, owner: type = None):
+        if record is None:
+            return self
+        value = record.get(self.name)
+        if not value or not value.isdigit():
+            return None
+        try:
+            return datetime.strptime(value, self.date_format).date()
+        except ValueError:
+            return None
+
+
+class FieldSpec:
+    """An ordered list of fields describing a track format, parsed in a
+    single pass from left to right without backtracking:
+
+    * A fixed field takes its width, its marker if it does not fit.
+    * A variable field takes as many characters as fit, less the width of
+      mandatory fixed fields of the same characters right after it (e.g. a
+      one digit marker after a variable number). Its marker is taken
+      instead of an empty field.
+    * An optional field is skipped if it does not fit, or if the next field
+      would not fit after it.
+    """
+
+    def __init__(self, fields: list, record: type = Fields) -> None:
+        self._fields = tuple(fields)
+        self._record = record
+        self._index = {}
+        steps = []
+        for (i, field) in enumerate(self._fields):
+            following = self._fields[i + 1] if i + 1 < len(self._fields) else None
+            if field.literal is not None:
+                steps.append((LITERAL, field))
+                continue
+            self._index[field.name] = len(self._index)
+            if not (field.variable or field.optional or field.marker is not None):
+                # Consecutive fixed fields of the same characters are checked at once
+                if steps and steps[-1][0] == BLOCK and steps[-1][2][0].chars == field.chars:
+                    (_, run, block, width) = steps.pop()
+                    steps.append((BLOCK, run, block + (field,), width + field.min_len))
+                else:
+                    steps.append((BLOCK, field.run, (field,), field.min_len))
+                continue
+            # Characters a variable field leaves to the fields after it
+            reserve = 0
+            for after in (self._fields[i + 1:] if field.variable else ()):
+                if (after.literal is not None or after.variable or after.optional or after.marker is not None
+                        or after.chars != field.chars):
+                    break
+                reserve += after.min_len
+            span = None if field.max_len is None else field.max_len + reserve
+            steps.append((FIELD, field, field.run.match, span, reserve, following))
+        self._steps = tuple(steps)
+
+    @property
+    def names(self) -> tuple:
+        return tuple(self._index)
+
+    def parse(self, data: str, **extra) -> Fields:
+        """Returns the record of data, raises FieldError if it does not fit.
+        Keyword arguments are added as extra fields.
+        """
+        offsets = []
+        pos = 0
+        for step in self._steps:
+            kind = step[0]
+            if kind == BLOCK:
+                (_, run, block, width) = step
+                end = run.match(data, pos, pos + width).end()
+                if end != pos + width:
+                    raise self.__block_error(block, pos, end)
+                for field in block:
+                    offsets += (pos + 1, pos + field.min_len + 1)
+                    pos += field.min_len
+            elif kind == LITERAL:
+                literal = step[1].literal
+                if not data.startswith(literal, pos):
+                    raise FieldError(pos, "Separator", step[1].expected)
+                pos += len(literal)
+            else:
+                (_, field, run, span, reserve, following) = step
+                length = run(data, pos, len(data) if span is None else pos + span).end() - pos - reserve
+                if length > 0 and length >= field.min_len:
+                    end = pos + length
+                elif field.marker is not None and data.startswith(field.marker, pos):
+                    end = pos + len(field.marker)
+                elif length <= 0 and field.min_len == 0:
+                    end = pos  # Empty
+                else:
+                    end = None
+                if end is not None and field.optional and following is not None and \
+                        _take(following, data, end) is None:
+                    end = None  # Leave the characters to the next field
+                if end is not None:
+                    offsets += (pos + 1, end + 1)
+                    pos = end
+                elif field.optional:
+                    offsets += (0, 0)
+                else:
+                    raise FieldError(pos, field.name, field.expected)
+        if pos != len(data):
+            raise FieldError(pos, "Data", "end of track")
+        # Tracks are short, a byte per offset
+        offsets = bytes(offsets) if len(data) < 255 else tuple(offsets)
+        return self._record(data, self._index, offsets, extra)
+
+    @staticmethod
+    def __block_error(block: tuple, pos: int, end: int) -> FieldError:
+        """Returns the error of the fixed field the block stopped fitting in."""
+        for field in block:
+            if end < pos + field.min_len:
+                return FieldError(pos, field.name, field.expected)
+            pos += field.min_len
+
+
+def _take(field: Field, data: str, pos: int) -> int:
+    """Returns the end of the field at pos, None if it does not fit. Looks
+    ahead a single field, without a reserve.
+    """
+    if field.literal is not None:
+        return pos + len(field.literal) if data.startswith(field.literal, pos) else None
+    length = field.run.match(data, pos, len(data) if field.max_len is None else pos + field.max_len).end() - pos
+    if length > 0 and length >= field.min_len:
+        return pos + length
+    if field.marker is not None and data.startswith(field.marker, pos):
+        return pos + len(field.marker)
+    if length == 0 and field.min_len == 0:
+        return pos
+    return None
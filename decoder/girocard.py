@@ -1,15 +1,59 @@
 import logging
-import re
 
 import iso7812
+from decoder import iso4909, registry
 from decoder.baseparser import BaseParser
 from decoder.baseprinter import BasePrinter
+from decoder.fieldspec import FieldError, FieldSpec, Fixed, Lit, StrField, Var
 from decoder.iso4909 import (cb_details, cl_details, cscn_details, format_code,
                              ic_details, pincp_details, rm_details, sr_details)
 
 logger = logging.getLogger(__name__)
 
 
+class Track3Details(iso4909.Track3Details):
+    """Girocard track 3 fields, with typed accessors. There is no PAN field."""
+
+    __slots__ = ()
+    routing_code = StrField("BLZ")
+    account_number = StrField("KTO")
+
+
+TRACK3_FORMAT = FieldSpec([
+    Lit(";"),
+    Fixed("FC", 2),  # Format code
+    Fixed("MII", 2),  # MII, ISO 7812
+    Fixed("BLZ", 8),  # Routing code (Bankleitzahl)
+    Lit("="),
+    Fixed("KTO", 10),  # Account number (Kontonummer)
+    # Routing and account number check digit (calculation depends on account holding institution)
+    Fixed("CHK", 1),
+    Lit("="),
+    Fixed("CC", 3),  # Country code
+    Fixed("CuC", 3),  # Currency code
+    Fixed("CE", 1),  # Currency exponent
+    Fixed("AA", 4),  # Amount authorized (per cycle)
+    Fixed("AR", 4),  # Amount remaining (this cycle)
+    Fixed("CB", 4),  # Cycle begin (YDDD)
+    Fixed("CL", 2),  # Cycle length
+    Fixed("RC", 1),  # Retry count
+    Fixed("PINCP", 6),  # PIN control parameters
+    Fixed("IC", 1),  # Interchange control
+    Fixed("PANSR", 2),  # PAN service restriction
+    Fixed("FSANSR", 2),  # FSAN service restriction
+    Fixed("SSANSR", 2),  # SSAN service restriction
+    Fixed("ED", 4),  # Expiry data
+    Fixed("CSN", 1),  # Card sequence number
+    Fixed("CScN", 9, marker="="),  # Card security number
+    Var("FSAN", marker="="),  # First Subsidiary Account Number
+    Var("SSAN", marker="="),  # Second Subsidiary Account Number
+    Fixed("RM", 1),  # Relay marker
+    Fixed("CCD", 6, marker="="),  # Crypto check digit
+    Var("AD", chars=r"^?"),  # Additional data
+    Lit("?"),
+], Track3Details)
+
+
 class Parser(BaseParser):
     def process_trackdata(self, trackdata: tuple) -> tuple:
         track_details = [None, None, None]
@@ -20,41 +64,11 @@ class Parser(BaseParser):
         if data is None:
             logger.warn("No data for track %d", trackno)
             return tuple(track_details)
-        matcher = re.match(r"^\;(?P<FC>[0-9]{2})(?P<MII>[0-9]{2})(?P<BLZ>[0-9]{8})\=(?P<KTO>[0-9]{10})(?P<CHK>[0-9]{1})\=(?P<CC>[0-9]{3})(?P<CuC>[0-9]{3})(?P<CE>[0-9]{1})(?P<AA>[0-9]{4})(?P<AR>[0-9]{4})(?P<CB>[0-9]{4})(?P<CL>[0-9]{2})(?P<RC>[0-9]{1})(?P<PINCP>[0-9]{6})(?P<IC>[0-9]{1})(?P<PANSR>[0-9]{2})(?P<FSANSR>[0-9]{2})(?P<SSANSR>[0-9]{2})(?P<ED>[0-9]{4})(?P<CSN>[0-9]{1})(?P<CScN>[0-9]{9}|\=)(?P<FSAN>[0-9]*|\=)(?P<SSAN>[0-9]*|\=)(?P<RM>[0-9]{1})(?P<CCD>[0-9]{6}|\=)(?P<AD>[^\?]*)\?$", data)
-        if not matcher:
-            logger.warn("Non-Girocard track 3 format: '%s'", data)
+        try:
+            result = TRACK3_FORMAT.parse(data)
+        except FieldError as e:
+            logger.warn("Non-Girocard track 3 format, %s: '%s'", e, data)
             return tuple(track_details)
-        result = {
-            "trackno": 3,  # inline signal track
-            "FC": matcher.group("FC"),  # Format code
-            "MII": matcher.group("MII"),  # MII, ISO 7812
-            "BLZ": matcher.group("BLZ"),  # Routing code (Bankleitzahl)
-            "KTO": matcher.group("KTO"),  # Account number (Kontonummer)
-            # Routing and account number check digit (calculation depends on account holding institution)
-            "CHK": matcher.group("CHK"),
-            "CC": matcher.group("CC"),  # Country code
-            "CuC": matcher.group("CuC"),  # Currency code
-            "CE": matcher.group("CE"),  # Currency exponent
-            "AA": matcher.group("AA"),  # Amount authorized (per cycle)
-            "AR": matcher.group("AR"),  # Amount remaining (this cycle)
-            "CB": matcher.group("CB"),  # Cycle begin (YDDD)
-            "CL": matcher.group("CL"),  # Cycle length
-            "RC": matcher.group("RC"),  # Retry count
-            "PINCP": matcher.group("PINCP"),  # PIN control parameters
-            "IC": matcher.group("IC"),  # Interchange control
-            "PANSR": matcher.group("PANSR"),  # PAN service restriction
-            "FSANSR": matcher.group("FSANSR"),  # FSAN service restriction
-            "SSANSR": matcher.group("SSANSR"),  # SSAN service restriction
-            "ED": matcher.group("ED"),  # Expiry data
-            "CSN": matcher.group("CSN"),  # Card sequence number
-            "CScN": matcher.group("CScN"),  # Card security number
-            "FSAN": matcher.group("FSAN"),  # First Subsidiary Account Number
-            "SSAN": matcher.group("SSAN"),  # Second Subsidiary Account Number
-            "RM": matcher.group("RM"),  # Relay marker
-            "CCD": matcher.group("CCD"),  # Crypto check digit
-            "AD": matcher.group("AD"),  # Additional data
-        }
-
         track_details[trackno - 1] = result
         return tuple(track_details)
 
@@ -129,3 +143,6 @@ class Printer(BasePrinter):
                     f"  ->                            {rm_details(data['RM'])}")
             print(f"Crypto check digits:            {data['CCD']}")
             print(f"Additional data (AD):           {data['AD']}")
+
+
+registry.register("girocard", (3,), Parser, Printer, {3: TRACK3_FORMAT.names})
@@ -1,16 +1,77 @@
+import functools
 import logging
-import re
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import iso7812
+from decoder import registry
 from decoder.baseparser import BaseParser
 from decoder.baseprinter import BasePrinter
+from decoder.fieldspec import (DateField, FieldError, Fields, FieldSpec, Fixed,
+                               IntField, Lit, StrField, Var)
 from decoder.utils import check_luhn
 
 logger = logging.getLogger(__name__)
 
 
-def format_code(code: str) -> str:
+class Track3Details(Fields):
+    """ISO 4909 track 3 fields, with typed accessors."""
+
+    __slots__ = ()
+    CONSTANTS = {"trackno": 3}  # inline signal track
+    pan = StrField("PAN")
+    country_code = IntField("CC")
+    currency_code = IntField("CuC")
+    currency_exponent = IntField("CE")
+    amount_authorized = IntField("AA")
+    amount_remaining = IntField("AR")
+    cycle_length = IntField("CL")
+    retry_count = IntField("RC")
+    expiry = DateField("ED", "%y%m")
+    card_sequence_number = IntField("CSN")
+
+    @property
+    def cycle_begin(self) -> datetime:
+        """Start of the current cycle, None if there is none."""
+        try:
+            return cb_details(self["CB"], self["ED"])
+        except ValueError:
+            return None
+
+
+TRACK3_FORMAT = FieldSpec([
+    Lit(";"),
+    Fixed("FC", 2),  # Format code
+    Var("PAN", 1, 19, optional=True),  # Primary account number
+    Lit("="),
+    Fixed("CC", 3),  # Country code
+    Lit("="),
+    Fixed("CuC", 3),  # Currency code
+    Fixed("CE", 5),  # Currency exponent
+    Fixed("AA", 4),  # Amount authorized (per cycle)
+    Fixed("AR", 4),  # Amount remaining (this cycle)
+    Fixed("CB", 4),  # Cycle begin (YDDD)
+    Fixed("CL", 2),  # Cycle length
+    Fixed("RC", 1),  # Retry count
+    Fixed("PINCP", 6, marker="="),  # PIN control parameters
+    Fixed("IC", 1),  # Interchange control
+    Fixed("PANSR", 2),  # PAN service restriction
+    Fixed("FSANSR", 2),  # FSAN service restriction
+    Fixed("SSANSR", 2),  # SSAN service restriction
+    Fixed("ED", 4, marker="="),  # Expiry data
+    Fixed("CSN", 1),  # Card sequence number
+    Fixed("CScN", 9, marker="="),  # Card security number
+    Var("FSAN"),  # First Subsidiary Account Number
+    Lit("="),
+    Var("SSAN"),  # Second Subsidiary Account Number
+    Lit("="),
+    Fixed("RM", 1),  # Relay marker
+    Fixed("CCD", 6, marker="="),  # Crypto check digit
+    Var("AD", chars=r"^?"),  # Additional data
+    Lit("?"),
+], Track3Details)
+
+
+def _format_code(code: str) -> str:
     if code == "00":
         return "Invalid for international interchange."
     elif code == "01":
@@ -22,7 +83,7 @@ def format_code(code: str) -> str:
     return "Available for use by individual card issuers but not for international interchange."
 
 
-def cl_details(code: str) -> str:
+def _cl_details(code: str) -> str:
     if code >= "00" and code <= "79":
         return "Number of days."
     elif code == "80":
@@ -45,7 +106,7 @@ def cl_details(code: str) -> str:
         return "Reserved for proprietary use of card issuer, but not for international interchange."
 
 
-def ic_details(code: str) -> str:
+def _ic_details(code: str) -> str:
     if code >= "00" and code <= "79":
         return "Number of days."
     elif code == "0":
@@ -58,65 +119,65 @@ def ic_details(code: str) -> str:
         return "Limited interchange, recommended for test cards."
 
 
-def sr_details(code: str) -> str:
-    digit1 = code[0]
-    digit2 = code[1]
-    result = ""
-
+def _sr_digit1(digit1: str) -> str:
     if digit1 == "0":
-        result += "Associated account number not encoded on track"
+        return "Associated account number not encoded on track"
     elif digit1 == "1":
-        result += "Savings account"
+        return "Savings account"
     elif digit1 == "2":
-        result += "Current or checking account"
+        return "Current or checking account"
     elif digit1 == "3":
-        result += "Credit card account"
+        return "Credit card account"
     elif digit1 == "4":
-        result += "Generic or universal account"
+        return "Generic or universal account"
     elif digit1 == "5":
-        result += "Interest-bearing current or checking account"
+        return "Interest-bearing current or checking account"
     elif digit1 >= "6" and digit1 <= "8":
-        result += "Reserved for future use by ISO/TC 68"
-    else:
-        result += "Reserved for card issuer's internal use, not for interchange"
+        return "Reserved for future use by ISO/TC 68"
+    return "Reserved for card issuer's internal use, not for interchange"
 
-    result += ", "
 
+def _sr_digit2(digit2: str) -> str:
     if digit2 == "0":
-        result += "No restrictions."
+        return "No restrictions."
     elif digit2 == "1":
-        result += "No cash dispense."
+        return "No cash dispense."
     elif digit2 == "2":
-        result += "No point of sale (POS) transaction."
+        return "No point of sale (POS) transaction."
     elif digit2 == "3":
-        result += "No cash dispense and no POS transaction."
+        return "No cash dispense and no POS transaction."
     elif digit2 == "4":
-        result += "Authorization required."
+        return "Authorization required."
     elif digit2 >= "6" and digit2 <= "7":
-        result += "Reserved for future use by ISO/TC 68."
-    else:
-        result += "Reserved for card issuer's internal use, only local use and under agreement."
+        return "Reserved for future use by ISO/TC 68."
+    return "Reserved for card issuer's internal use, only local use and under agreement."
+
 
-    return result
+def _sr_details(code: str) -> str:
+    return f"{_sr_digit1(code[0])}, {_sr_digit2(code[1])}"
 
 
+@functools.lru_cache(maxsize=4096)
 def cb_details(code: str, expiry: str) -> datetime:
     if expiry == "=":
         return None
     if code == "0000":  # No cycle, placeholder
         return None
-    expiry_date = datetime.strptime(expiry, "%y%m")
+    (expiry_year, expiry_month) = (int(expiry[:2]), int(expiry[2:]))
+    if len(expiry) != 4 or not 1 <= expiry_month <= 12:
+        raise ValueError(f"Invalid expiry date: {expiry}")
+    expiry_year += 1900 if expiry_year >= 69 else 2000  # As strptime() %y
     year_in_century = code[0]
-    days_in_year = code[1:]
-    start_year = expiry_date.year - \
-        (expiry_date.year % 10) + int(year_in_century)
-    if start_year > expiry_date.year:  # decade changed
+    days_in_year = int(code[1:])
+    if len(code) != 4 or not 1 <= days_in_year <= 366:
+        raise ValueError(f"Invalid cycle begin: {code}")
+    start_year = expiry_year - (expiry_year % 10) + int(year_in_century)
+    if start_year > expiry_year:  # decade changed
         start_year -= 10
-    cycle_begin = datetime.strptime(f"{start_year}{days_in_year}", "%Y%j")
-    return cycle_begin
+    return datetime(start_year, 1, 1) + timedelta(days=days_in_year - 1)
 
 
-def rm_details(code: str) -> str:
+def _rm_details(code: str) -> str:
     if code == "0":
         return "Include AD and DD fields in transactions messages."
     elif code == "1":
@@ -126,33 +187,33 @@ def rm_details(code: str) -> str:
     return "Invalid."
 
 
-def pincp_details(code: str, fc: str) -> str:
+def _pincp_algo(fc: str, a_type: str) -> str:
     if fc == "01":
-        a_type = code[:2]
-        pin_offset = code[2:]
-        algo = "Reserved for future use by ISO/TC 68"
         if a_type >= "00" and a_type <= "09":
-            algo = "Private"
+            return "Private"
         elif a_type >= "10" and a_type <= "19":
-            algo = "DEA"
-        return f"Algorithm: {algo}, PIN offset: {pin_offset}"
+            return "DEA"
     elif fc == "02":
-        a_type = code[0]
-        a_key = code[1]
-        pin_offset = code[2:]
-        algo = "Reserved for future use by ISO/TC 68"
         if a_type == "0":
-            algo = "Private"
+            return "Private"
         elif a_type == "1":
-            algo = "DEA"
-        return f"Algorithm: {algo}, Algorithm key/seed: {a_key}, PIN offset: {pin_offset}"
+            return "DEA"
+    return "Reserved for future use by ISO/TC 68"
+
+
+def pincp_details(code: str, fc: str) -> str:
+    if fc == "01":
+        algo = PINCP_ALGORITHMS.get(("01", code[:2])) or _pincp_algo(fc, code[:2])
+        return f"Algorithm: {algo}, PIN offset: {code[2:]}"
+    elif fc == "02":
+        algo = PINCP_ALGORITHMS.get(("02", code[0])) or _pincp_algo(fc, code[0])
+        return f"Algorithm: {algo}, Algorithm key/seed: {code[1]}, PIN offset: {code[2:]}"
     return "No details"
 
 
-def cscn_details(code: str) -> str:
+def _cscn_algo(code: str) -> str:
     algo = code[0]
     algo_detail = ""
-    vv = code[0:]
 
     if algo >= "0" and algo <= "4":
         algo_detail = "National use"
@@ -161,7 +222,55 @@ def cscn_details(code: str) -> str:
     elif code == "9":
         algo_detail = "Private use"
 
-    return f"Algorithm: {algo_detail}, verification value: {vv}"
+    return algo_detail
+
+
+def cscn_details(code: str) -> str:
+    algo_detail = CSCN_ALGORITHMS.get(code[0])
+    if algo_detail is None:
+        algo_detail = _cscn_algo(code)
+    return f"Algorithm: {algo_detail}, verification value: {code}"
+
+
+def _codes(width: int) -> list:
+    """Returns all codes of width digits."""
+    return [f"{i:0{width}d}" for i in range(10 ** width)]
+
+
+def _table(interpret, width: int) -> dict:
+    """Returns the interpretation of all codes of width digits."""
+    return {code: interpret(code) for code in _codes(width)}
+
+
+# Interpretations of the codes, looked up per card
+FORMAT_CODES = _table(_format_code, 2)
+CL_DETAILS = _table(_cl_details, 2)
+IC_DETAILS = _table(_ic_details, 1)
+SR_DETAILS = _table(_sr_details, 2)
+RM_DETAILS = _table(_rm_details, 1)
+PINCP_ALGORITHMS = {(fc, a_type): _pincp_algo(fc, a_type)
+                    for (fc, width) in (("01", 2), ("02", 1)) for a_type in _codes(width)}
+CSCN_ALGORITHMS = {algo: _cscn_algo(algo + "0") for algo in _codes(1)}  # By the first digit
+
+
+def format_code(code: str) -> str:
+    return FORMAT_CODES.get(code) or _format_code(code)
+
+
+def cl_details(code: str) -> str:
+    return CL_DETAILS.get(code) or _cl_details(code)
+
+
+def ic_details(code: str) -> str:
+    return IC_DETAILS.get(code) or _ic_details(code)
+
+
+def sr_details(code: str) -> str:
+    return SR_DETAILS.get(code) or _sr_details(code)
+
+
+def rm_details(code: str) -> str:
+    return RM_DETAILS.get(code) or _rm_details(code)
 
 
 class Parser(BaseParser):
@@ -174,37 +283,11 @@ class Parser(BaseParser):
         if data is None:
             logger.warn("No data for track %d", trackno)
             return tuple(track_details)
-        matcher = re.match(r"^\;(?P<FC>[0-9]{2})(?P<PAN>[0-9]{1,19})?\=(?P<CC>[0-9]{3}\=)(?P<CuC>[0-9]{3})(?P<CE>[0-9]{5})(?P<AA>[0-9]{4})(?P<AR>[0-9]{4})(?P<CB>[0-9]{4})(?P<CL>[0-9]{2})(?P<RC>[0-9]{1})(?P<PINCP>[0-9]{6}|\=)(?P<IC>[0-9]{1})(?P<PANSR>[0-9]{2})(?P<FSANSR>[0-9]{2})(?P<SSANSR>[0-9]{2})(?P<ED>[0-9]{4}|\=)(?P<CSN>[0-9]{1})(?P<CScN>[0-9]{9}|\=)(?P<FSAN>[0-9]*)\=(?P<SSAN>[0-9]*)\=(?P<RM>[0-9]{1})(?P<CCD>[0-9]{6}|\=)(?P<AD>[^\?]*)\?$", data)
-        if not matcher:
-            logger.warn("Non-ISO 4909 track 3 format: '%s'", data)
+        try:
+            result = TRACK3_FORMAT.parse(data)
+        except FieldError as e:
+            logger.warn("Non-ISO 4909 track 3 format, %s: '%s'", e, data)
             return tuple(track_details)
-        result = {
-            "trackno": 3,  # inline signal track
-            "FC": matcher.group("FC"),  # Format code
-            "PAN": matcher.group("PAN"),  # Primary account number
-            "CC": matcher.group("CC"),  # Country code
-            "CuC": matcher.group("CuC"),  # Currency code
-            "CE": matcher.group("CE"),  # Currency exponent
-            "AA": matcher.group("AA"),  # Amount authorized (per cycle)
-            "AR": matcher.group("AR"),  # Amount remaining (this cycle)
-            "CB": matcher.group("CB"),  # Cycle begin (YDDD)
-            "CL": matcher.group("CL"),  # Cycle length
-            "RC": matcher.group("RC"),  # Retry count
-            "PINCP": matcher.group("PINCP"),  # PIN control parameters
-            "IC": matcher.group("IC"),  # Interchange control
-            "PANSR": matcher.group("PANSR"),  # PAN service restriction
-            "FSANSR": matcher.group("FSANSR"),  # FSAN service restriction
-            "SSANSR": matcher.group("SSANSR"),  # SSAN service restriction
-            "ED": matcher.group("ED"),  # Expiry data
-            "CSN": matcher.group("CSN"),  # Card sequence number
-            "CScN": matcher.group("CScN"),  # Card security number
-            "FSAN": matcher.group("FSAN"),  # First Subsidiary Account Number
-            "SSAN": matcher.group("SSAN"),  # Second Subsidiary Account Number
-            "RM": matcher.group("RM"),  # Relay marker
-            "CCD": matcher.group("CCS"),  # Crypto check digit
-            "AD": matcher.group("AD"),  # Additional data
-        }
-
         track_details[trackno - 1] = result
         return tuple(track_details)
 
@@ -213,7 +296,7 @@ class Printer(BasePrinter):
     def print_trackdata(self, track_details: tuple):
         for (trackno, data) in enumerate(track_details, 1):
             if trackno != 3:
-                break
+                continue
             if data is None:
                 print(f"No details for track {trackno}")
                 continue
@@ -235,7 +318,7 @@ class Printer(BasePrinter):
             print(f"Cycle begin (YDDD):             {data['CB']}")
             if self._print_verbose:
                 print(
-                    f"  ->                   {cb_details(data['IC'], data['ED'])}")
+                    f"  ->                   {cb_details(data['CB'], data['ED'])}")
             print(f"Cycle length:                   {data['CL']}")
             print(f"Retry count:                    {data['RC']}")
             print(f"PIN control parameters:         {data['PINCP']}")
@@ -251,5 +334,8 @@ class Printer(BasePrinter):
             print(f"First subsidiary accnt:         {data['FSAN']}")
             print(f"Second subsidiary accnt:        {data['SSAN']}")
             print(f"Relay marker:                   {data['RM']}")
-            print(f"Crypto check digit:             {data['CCS']}")
+            print(f"Crypto check digit:             {data['CCD']}")
             print(f"Additional data:                {data['AD']}")
+
+
+registry.register("iso4909", (3,), Parser, Printer, {3: TRACK3_FORMAT.names})
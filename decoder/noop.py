@@ -1,6 +1,9 @@
+from decoder import registry
 from decoder.baseparser import BaseParser
 from decoder.baseprinter import BasePrinter
 
+FIELDS = ("data",)  # The raw track data
+
 
 class Printer(BasePrinter):
 
@@ -15,3 +18,6 @@ class Parser(BaseParser):
 
     def process_trackdata(self, trackdata: tuple) -> tuple:
         return trackdata
+
+
+registry.register("noop", (1, 2, 3), Parser, Printer, {1: FIELDS, 2: FIELDS, 3: FIELDS})
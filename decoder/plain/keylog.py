@@ -0,0 +1,90 @@
+import logging
+import struct
+
+import keyboard
+
+logger = logging.getLogger(__name__)
+
+# Key event recording: a header, then one record per event. The key name
+# follows a record, it is needed to decode without a keymap.
+MAGIC = b"MSRK"
+VERSION = 1
+HEADER = struct.Struct("<4sBd")  # Magic, version, time of the first event
+RECORD = struct.Struct("<IHBB")  # Microseconds since the previous event, scancode, flags, name length
+FLAG_UP = 0x01
+
+
+def write_header(fh, start: float) -> None:
+    fh.write(HEADER.pack(MAGIC, VERSION, start))
+
+
+def write_event(fh, e: keyboard.KeyboardEvent, last_time: float) -> None:
+    name = (e.name or "").encode("utf-8")[:255]
+    delta = max(0, round((e.time - last_time) * 1e6))
+    flags = FLAG_UP if e.event_type == keyboard.KEY_UP else 0
+    fh.write(RECORD.pack(min(delta, 0xffffffff), e.scan_code, flags, len(name)) + name)
+
+
+def write_events(fh, key_events: list) -> None:
+    if not key_events:
+        return
+    write_header(fh, key_events[0].time)
+    last_time = key_events[0].time
+    for e in key_events:
+        write_event(fh, e, last_time)
+        last_time = e.time
+
+
+def read_events(fh) -> list:
+    """Reads a recording into key events with their original times."""
+    data = fh.read()
+    if len(data) == 0:
+        return []
+    if len(data) < HEADER.size:
+        raise ValueError("Key event recording truncated in the header")
+    (magic, version, event_time) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a key event recording (version {VERSION})")
+    events = []
+    pos = HEADER.size
+    while pos + RECORD.size <= len(data):
+        (delta, scan_code, flags, name_len) = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        name = data[pos:pos + name_len].decode("utf-8")
+        pos += name_len
+        event_time += delta / 1e6
+        event_type = keyboard.KEY_UP if flags & FLAG_UP else keyboard.KEY_DOWN
+        events.append(keyboard.KeyboardEvent(event_type, scan_code, name=name or None, time=event_time))
+    if pos != len(data):
+        logger.warning("Recording ends with an incomplete event")
+    logger.debug("Read %d key events", len(events))
+    return events
+
+
+class RecordingSource:
+    """Passes the events of a key event source through and appends them to
+    a recording.
+    """
+
+    def __init__(self, source, fh) -> None:
+        self._source = source
+        self._fh = fh
+        self._last_time = None
+
+    def get(self, timeout: float = None) -> keyboard.KeyboardEvent:
+        e = self._source.get(timeout)
+        if e is not None:
+            if self._last_time is None:
+                write_header(self._fh, e.time)
+                self._last_time = e.time
+            write_event(self._fh, e, self._last_time)
+            self._last_time = e.time
+        return e
+
+    def flush(self) -> None:
+        self._source.flush()
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._source.close()
+        self._fh.close()
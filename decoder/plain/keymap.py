@@ -0,0 +1,130 @@
+import functools
+import logging
+
+import keyboard
+
+logger = logging.getLogger(__name__)
+
+# Modifier states, the rows of a compiled table
+NONE = 0
+SHIFT = 1
+ALTGR = 2
+STATES = 3
+STRIDE = 256  # Scancodes per state
+
+SHIFT_SCANCODES = (42, 54)
+ALTGR_SCANCODES = (100,)  # Right alt on Linux
+ENTER_SCANCODE = 28
+SPACE_SCANCODE = 57
+
+# Layouts as typed by the reader: per modifier state the characters of
+# consecutive scancodes (PC set 1), starting at the given scancode.
+US = {
+    NONE: {2: "1234567890-=", 16: "qwertyuiop[]", 30: "asdfghjkl;'`", 43: "\\", 44: "zxcvbnm,./", 57: " "},
+    SHIFT: {2: "!@#$%^&*()_+", 16: "QWERTYUIOP{}", 30: "ASDFGHJKL:\"~", 43: "|", 44: "ZXCVBNM<>?", 57: " "},
+}
+DE = {
+    NONE: {2: "1234567890ß´", 16: "qwertzuiopü+", 30: "asdfghjklöä^", 43: "#", 44: "yxcvbnm,.-", 57: " ", 86: "<"},
+    SHIFT: {2: "!\"§$%&/()=?`", 16: "QWERTZUIOPÜ*", 30: "ASDFGHJKLÖÄ°", 43: "'", 44: "YXCVBNM;:_", 57: " ", 86: ">"},
+    ALTGR: {3: "²³", 8: "{[]}\\", 16: "@", 18: "€", 27: "~", 50: "µ", 86: "|"},
+}
+FR = {
+    NONE: {2: "&é\"'(-è_çà)=", 16: "azertyuiop^$", 30: "qsdfghjklmù²", 43: "*", 44: "wxcvbn,;:!", 57: " ", 86: "<"},
+    SHIFT: {2: "1234567890°+", 16: "AZERTYUIOP¨£", 30: "QSDFGHJKLM%", 43: "µ", 44: "WXCVBN?./§", 57: " ", 86: ">"},
+    ALTGR: {3: "~#{[|`\\^@]}", 18: "€"},
+}
+
+# Dead keys are typed by the reader followed by a space
+LAYOUTS = {"us": (US, ""), "de": (DE, "^´`"), "fr": (FR, "^¨")}
+
+SENTINELS_START = "%;"
+SENTINEL_END = "?"
+TRACK_CHARSET = set(chr(c) for c in range(0x20, 0x60))  # Track 1 is the widest
+
+
+class Keymap:
+    """A layout compiled into a flat table, indexed by modifier state and
+    scancode.
+    """
+
+    def __init__(self, name: str, layout: dict, dead_keys: str) -> None:
+        self.name = name
+        self._table = [None] * (STATES * STRIDE)
+        for (state, runs) in layout.items():
+            for (first, chars) in runs.items():
+                for (i, char) in enumerate(chars):
+                    self._table[state * STRIDE + first + i] = char
+        self._dead_keys = set(dead_keys)
+
+    def translate(self, key_events: list) -> list:
+        """Translates the key events of a swipe in one pass, returns the lines
+        (tracks) terminated by enter, including an unterminated last one.
+        """
+        table = self._table
+        lines = []
+        line = []
+        (shift, altgr) = (False, False)
+        dead = False  # Last character was a dead key
+        for e in key_events:
+            scan_code = e.scan_code
+            down = e.event_type == keyboard.KEY_DOWN
+            if scan_code in SHIFT_SCANCODES:
+                shift = down
+                continue
+            if scan_code in ALTGR_SCANCODES:
+                altgr = down
+                continue
+            if not down:
+                continue
+            if scan_code == ENTER_SCANCODE:
+                if line:
+                    lines.append("".join(line))
+                line = []
+                dead = False
+                continue
+            if dead and scan_code == SPACE_SCANCODE:
+                dead = False
+                continue
+            char = table[(ALTGR if altgr else SHIFT if shift else NONE) * STRIDE + scan_code]
+            if char is None:
+                logger.debug("No character for scancode %d in layout %s", scan_code, self.name)
+                continue
+            dead = char in self._dead_keys
+            line.append(char)
+        if line:
+            lines.append("".join(line))
+        return lines
+
+
+@functools.lru_cache(maxsize=None)
+def get_keymap(name: str) -> Keymap:
+    """Returns the compiled keymap, layouts are compiled on first use."""
+    (layout, dead_keys) = LAYOUTS[name]
+    logger.debug("Compiling keymap %s", name)
+    return Keymap(name, layout, dead_keys)
+
+
+def score(lines: list) -> int:
+    """Rates how much the lines look like track data."""
+    points = 0
+    for line in lines:
+        if line[0] in SENTINELS_START:
+            points += 2
+        if line[-1] == SENTINEL_END:
+            points += 2
+        points -= sum(1 for char in line if char not in TRACK_CHARSET)
+    return points
+
+
+def detect(key_events: list) -> Keymap:
+    """Returns the keymap whose translation of the key events fits the track
+    sentinels and character set best, the first layout on a tie.
+    """
+    best = None
+    for name in LAYOUTS:
+        keymap = get_keymap(name)
+        points = score(keymap.translate(key_events))
+        if best is None or points > best[0]:
+            best = (points, keymap)
+    logger.debug("Detected keymap %s", best[1].name)
+    return best[1]
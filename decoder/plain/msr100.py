@@ -1,10 +1,13 @@
 import logging
+import queue
 import sys
+import time
+
 import keyboard
 from .. basedecoder import BaseDecoder
 from .. raw.iso7813 import sentinels, SS
 
-from decoder.plain import remap
+from decoder.plain import keymap as keymaps
 
 logger = logging.getLogger(__name__)
 
@@ -13,78 +16,159 @@ TRACK_1 = 0
 TRACK_2 = 1
 TRACK_3 = 2
 
+SWIPE_TIMEOUT = 0.5  # Seconds without a key event that end a swipe
+
+
+def flush_terminal():
+    try:
+        # Flush on windows
+        import msvcrt
+        while msvcrt.kbhit():
+            msvcrt.getch()
+    except ImportError:
+        # Flush on unix
+        import termios
+        termios.tcflush(sys.stdin, termios.TCIOFLUSH)
+
+
+class KeyboardSource:
+    """Key events of all keyboards, queued by a keyboard hook as they arrive.
+    The keys are suppressed, the track data must not be typed into other
+    windows. Requires root on Linux.
+    """
+
+    def __init__(self) -> None:
+        self._queue = queue.Queue()
+        self._hook = keyboard.hook(self._queue.put, suppress=True)
+
+    def get(self, timeout: float = None) -> keyboard.KeyboardEvent:
+        """Returns the next event, None if there was none within timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def flush(self) -> None:
+        flush_terminal()  # Keys typed before the hook was installed
+
+    def close(self) -> None:
+        keyboard.unhook(self._hook)
+
+
+class FakeSource:
+    """Hands out a list of key events like the KeyboardSource, for tests
+    without a reader. The gaps between the event times are honoured for the
+    timeouts, with realtime they are also waited for. Raises EOFError when all
+    events are taken.
+    """
+
+    def __init__(self, events: list, realtime: bool = False) -> None:
+        self._events = list(events)
+        self._pos = 0
+        self._realtime = realtime
+        self._waited = 0  # Part of the gap before the next event already passed
+
+    def get(self, timeout: float = None) -> keyboard.KeyboardEvent:
+        if self._pos >= len(self._events):
+            raise EOFError("No more key events")
+        event = self._events[self._pos]
+        gap = event.time - self._events[self._pos - 1].time if self._pos > 0 else 0
+        gap = max(0, gap - self._waited)
+        if timeout is not None and gap > timeout:
+            if self._realtime:
+                time.sleep(timeout)
+            self._waited += timeout
+            return None
+        if self._realtime and gap > 0:
+            time.sleep(gap)
+        self._waited = 0
+        self._pos += 1
+        return event
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TrackAssembler:
+    """Assembles the lines (tracks) of a swipe from the key events as they
+    arrive. Every line is terminated by enter.
+
+    Without a keymap the key names of the host's layout are used. With a
+    keymap ("us", "de", "fr" or "auto" to detect it from the sentinels) the
+    events are collected and translated from their scancodes in one pass.
+    """
+
+    def __init__(self, keymap: str = None) -> None:
+        self._keymap = keymap
+        self._events = []  # Only with a keymap
+        self._buf = []
+        self.lines = []
+
+    def feed(self, e: keyboard.KeyboardEvent) -> None:
+        if self._keymap is not None:
+            self._events.append(e)
+            return
+        if e.event_type == keyboard.KEY_UP or "shift" in e.name:
+            return
+        if e.name == "enter":  # New line
+            if len(self._buf) > 0:
+                line = "".join(self._buf)
+                self.lines.append(line)
+                logger.debug("read buffer: '%s'", line)
+            self._buf = []
+            return
+        if e.name == "space":
+            self._buf.append(" ")
+        else:
+            self._buf.append(e.name)
+
+    def finish(self) -> list:
+        """Returns the lines, including an unterminated last one."""
+        if self._keymap is not None:
+            keymap = keymaps.detect(self._events) if self._keymap == "auto" else keymaps.get_keymap(self._keymap)
+            self.lines = keymap.translate(self._events)
+            self._events = []
+            for line in self.lines:
+                logger.debug("read buffer: '%s'", line)
+            return self.lines
+        if len(self._buf) > 0:
+            logger.debug("Line without enter: '%s'", "".join(self._buf))
+            self.lines.append("".join(self._buf))
+            self._buf = []
+        return self.lines
+
 
 class Decoder(BaseDecoder):
 
-    _remap_from_us = False
+    _keymap = None
 
-    def __init__(self, remap_from_us: bool = False) -> None:
+    def __init__(self, remap_from_us: bool = False, source=None, swipe_timeout: float = SWIPE_TIMEOUT,
+                 keymap: str = None) -> None:
         super().__init__()
-        self._remap_from_us = remap_from_us
+        # Scancodes are translated with the keymap, remap_from_us is the US one
+        self._keymap = keymap if keymap is not None else ("us" if remap_from_us else None)
+        self._source = source  # Key event source, the keyboard if None
+        self._swipe_timeout = swipe_timeout
 
     def _build_result(self, key_events: list) -> list:
         logger.debug("Reader input took %d seconds, %d keystrokes",
                      key_events[-1].time - key_events[0].time, len(key_events))
-        data_read = []
-        b = None
-        buf = ""
+        assembler = TrackAssembler(self._keymap)
         for e in key_events:
-            map_name = ""
-            if e.event_type == keyboard.KEY_UP or (e.event_type == keyboard.KEY_DOWN and "shift" in e.name):
-                b = e
-                continue
-            if e.event_type == keyboard.KEY_DOWN and b is not None and b.event_type == keyboard.KEY_DOWN and "shift" in b.name:
-                # Shift pressed before key
-                map_name = f"shift-{e.scan_code}"
-            else:
-                map_name = f"{e.scan_code}"
-            b = e
-            if e.name == "enter":  # New line
-                if len(buf) > 0:
-                    data_read.append(buf)
-                    logger.debug("read buffer: '%s'", buf)
-                buf = ""
-                continue
-            if self._remap_from_us:
-                buf += remap.US_PS2[map_name]
-            elif e.name == "space":
-                buf += " "
-            else:
-                buf += e.name
-        return data_read
+            assembler.feed(e)
+        return assembler.finish()
 
     def flush_input(self):
-        try:
-            # Flush on windows
-            import msvcrt
-            while msvcrt.kbhit():
-                msvcrt.getch()
-        except ImportError:
-            # Flush on unix
-            import termios
-            termios.tcflush(sys.stdin, termios.TCIOFLUSH)
+        flush_terminal()
 
-    def read_input(self) -> tuple:
+    def _assign_tracks(self, data_read: list) -> tuple:
         # The reader returns up to 3 tracks, separated by \n, ordered from track 1 to track 3.
         # If a track yields no data, no line is returned. If all tracks are read, a
         # single \n is isssued.
         result = [None, None, None]
-        len_read = -1
-        data_in_end = False
-        data_end_hotkey = "enter, enter"
-        key_events = []
-        print(f"Waiting for data, press '{data_end_hotkey}' to exit ...")
-        try:
-            while not data_in_end:
-                # Use keyboard for capturing the scancodes
-                key_events = keyboard.record(data_end_hotkey, suppress=True)
-                len_read = len(key_events)
-                if len_read > 0:
-                    data_in_end = True
-        finally:
-            self.flush_input()  # Flush the keyboard input buffer that was filled during record
-
-        data_read = self._build_result(key_events=key_events)
 
         if len(data_read) == 3:  # All tracks have data, we're done
             logger.debug("3 track read")
@@ -125,3 +209,40 @@ class Decoder(BaseDecoder):
                 result[TRACK_3] = data_read[0]
 
         return tuple(result)
+
+    def read_swipes(self):
+        """Yields the track data of every swipe as soon as the reader stops
+        typing for swipe_timeout seconds. Ends with the event source.
+        """
+        source = self._source if self._source is not None else KeyboardSource()
+        try:
+            while True:
+                try:
+                    event = source.get()  # Wait for the next card
+                except EOFError:
+                    return
+                assembler = TrackAssembler(self._keymap)
+                (first, count, ended) = (event, 0, False)
+                while event is not None:
+                    assembler.feed(event)
+                    (last, count) = (event, count + 1)
+                    try:
+                        event = source.get(self._swipe_timeout)
+                    except EOFError:
+                        ended = True
+                        break
+                logger.debug("Reader input took %f seconds, %d keystrokes", last.time - first.time, count)
+                source.flush()
+                yield self._assign_tracks(assembler.finish())
+                if ended:
+                    return
+        finally:
+            source.close()
+
+    def read_input(self) -> tuple:
+        print("Waiting for data ...")
+        swipes = self.read_swipes()
+        try:
+            return next(swipes, (None, None, None))
+        finally:
+            swipes.close()
@@ -1,75 +0,0 @@
-# Scancode map for US PS/2 Keyboards
-
-US_PS2 = {}
-US_PS2["2"] = "1"
-US_PS2["3"] = "2"
-US_PS2["4"] = "3"
-US_PS2["5"] = "4"
-US_PS2["6"] = "5"
-US_PS2["7"] = "6"
-US_PS2["8"] = "7"
-US_PS2["9"] = "8"
-US_PS2["10"] = "9"
-US_PS2["11"] = "0"
-US_PS2["12"] = "-"
-US_PS2["13"] = "="
-# US_PS2["14"] = "" # backspace
-# US_PS2["15"] ="" # caps-lock
-US_PS2["26"] = "["
-US_PS2["27"] = "]"
-# US_PS2["28"] ="enter"
-# US_PS2["29"] ="" # ctrl
-US_PS2["39"] = ";"
-US_PS2["40"] = "'"
-# US_PS2["41"] ="" # backtick
-# US_PS2["42"] ="" # shift
-US_PS2["43"] = "\\"
-US_PS2["51"] = ","
-US_PS2["52"] = "."
-US_PS2["53"] = "/"
-US_PS2["57"] = " "  # space
-
-# shift + key
-US_PS2["shift-2"] = "!"
-US_PS2["shift-3"] = "@"
-US_PS2["shift-4"] = "#"
-US_PS2["shift-5"] = "$"
-US_PS2["shift-6"] = "%"
-US_PS2["shift-7"] = "^"
-US_PS2["shift-8"] = "&"
-US_PS2["shift-9"] = "*"
-US_PS2["shift-10"] = "("
-US_PS2["shift-11"] = ")"
-US_PS2["shift-12"] = "_"
-US_PS2["shift-13"] = "+"
-US_PS2["shift-16"] = "Q"
-US_PS2["shift-17"] = "W"
-US_PS2["shift-18"] = "E"
-US_PS2["shift-19"] = "R"
-US_PS2["shift-20"] = "T"
-US_PS2["shift-21"] = "Y"
-US_PS2["shift-22"] = "U"
-US_PS2["shift-23"] = "I"
-US_PS2["shift-24"] = "O"
-US_PS2["shift-25"] = "P"
-US_PS2["shift-30"] = "A"
-US_PS2["shift-31"] = "S"
-US_PS2["shift-32"] = "D"
-US_PS2["shift-33"] = "F"
-US_PS2["shift-34"] = "G"
-US_PS2["shift-35"] = "H"
-US_PS2["shift-36"] = "J"
-US_PS2["shift-37"] = "K"
-US_PS2["shift-38"] = "L"
-US_PS2["shift-39"] = ":"
-US_PS2["shift-40"] = "\""
-US_PS2["shift-44"] = "Z"
-US_PS2["shift-45"] = "X"
-US_PS2["shift-46"] = "C"
-US_PS2["shift-47"] = "V"
-US_PS2["shift-48"] = "B"
-US_PS2["shift-49"] = "N"
-US_PS2["shift-50"] = "M"
-US_PS2["shift-51"] = "<"
-US_PS2["shift-52"] = ">"
-US_PS2["shift-53"] = "?"
@@ -1,10 +1,16 @@
+import functools
 import logging
 import re
+from typing import NamedTuple
 
 import iso7812
+from decoder import registry
 from decoder.baseparser import BaseParser
 from decoder.baseprinter import BasePrinter
+from decoder.fieldspec import (DateField, FieldError, Fields, FieldSpec, Fixed,
+                               IntField, Lit, StrField, Var)
 from decoder.utils import check_luhn
+from rawreader.bits import BitBuffer
 
 from ..basedecoder import BaseDecoder
 
@@ -101,66 +107,335 @@ sentinels[1] = {SS: "%", ES: "?", FS: "^"}
 sentinels[2] = {SS: ";", ES: "?", FS: "="}
 sentinels[3] = {SS: ";", ES: "?", FS: "="}
 
+
+class Track1Details(Fields):
+    """Track 1 fields, with typed accessors."""
+
+    __slots__ = ()
+    CONSTANTS = {"trackno": 1}  # inline signal track
+    pan = StrField("PAN")
+    name = StrField("NM")
+    country_code = IntField("CC")
+    expiry = DateField("ED", "%y%m")
+    service_code = StrField("SC")
+
+
+class Track2Details(Fields):
+    """Track 2 fields, with typed accessors."""
+
+    __slots__ = ()
+    CONSTANTS = {"trackno": 2, "CC": None}  # Country code is not on track 2
+    pan = StrField("PAN")
+    expiry = DateField("ED", "%y%m")
+    service_code = StrField("SC")
+
+
+# Track formats
+TRACK1_FORMAT = FieldSpec([
+    Lit("%"),
+    Fixed("FC", 1, "A-Z"),  # Format code
+    Var("PAN", 1, 19),  # Primary account number
+    Lit("^"),
+    Fixed("CC", 3, optional=True),  # Country code
+    Var("NM", 2, 26, r"^\^"),  # Name
+    Lit("^"),
+    Fixed("ED", 4, marker="^"),  # Expiry data
+    Fixed("SC", 3, marker="^"),  # Service code
+    Fixed("PVV", 5),  # PIN verification value
+    Var("DD", chars=r"^?"),  # Discretionary data
+    Lit("?"),
+], Track1Details)
+TRACK2_FORMAT = FieldSpec([
+    Lit(";"),
+    Var("PAN", 1, 19),  # Primary account number
+    Lit("="),
+    Fixed("ED", 4, marker="="),  # Expiry data
+    Fixed("SC", 3, marker="="),  # Service code
+    Fixed("PVV", 5),  # PIN verification value
+    Var("DD", chars=r"^?"),  # Discretionary data
+    Lit("?"),
+], Track2Details)
+NAME_FORMAT = re.compile(r"^(?P<SURNAME>[^\/]+)\/?(?P<FIRSTNAME>[^\.]*)(?P<TITLE>[\.]*)$")  # Track 1 name
+
 START_5 = "11010"  # ; + parity
 START_7 = "010001"  # % + parity
 
+# Symbol tables, indexed by the symbol's bits read as binary number (first bit
+# read is the MSB). Each entry is the character and if the parity is valid (odd).
+SYMBOLS_5 = [(BCD5_LSB[format(symbol >> 1, "04b")], symbol.bit_count() % 2 == 1) for symbol in range(32)]
+SYMBOLS_7 = [(chr(symbol + 32), symbol.bit_count() % 2 == 1) for symbol in range(128)]  # DEC SIXBIT
+
+SYMBOL_BLOCK = 64  # Symbols decoded at once
+
+# Sync search: every start sentinel in both swipe directions is a candidate.
+# Candidates with too many parity errors in their first symbols are dropped
+# before being decoded completely.
+MAX_SYNC_CANDIDATES = 32  # Per direction
+PRUNE_SYMBOLS = 4
+PRUNE_MAX_ERRORS = 1
+
+# Candidate scores
+SCORE_END = 3  # End sentinel found
+SCORE_LRC = 2  # LRC matches
+SCORE_PARITY_ERROR = -2  # Per symbol
+SCORE_PERFECT = SCORE_END + SCORE_LRC
+# End sentinel and LRC only count for a track with enough data symbols
+# between the sentinels, a short track is often a pair of sentinels in the data
+MIN_DATA_SYMBOLS = 8
+
+# Bit slip recovery: costs of the symbol segmentation
+MAX_REALIGN = 8  # Best candidates tried
+SLIP_COST = 4  # Dropped or extra bit
+PARITY_COST = 4
+CHARSET_COST = 2  # Valid symbol, but a character not expected on the track
+LRC_COST = 2  # End sentinel without matching LRC
+MAX_REALIGN_COST = 2 * SLIP_COST + PARITY_COST + LRC_COST
+CHARSET_5 = set("0123456789;=?")
+CHARSET_7 = set(chr(c) for c in range(0x20, 0x60))
+
+
+@functools.lru_cache(maxsize=4096)
+def _slip_symbol(chunk: str, symbol_len: int) -> tuple:
+    """Returns the cheapest (cost, symbol) for a chunk of symbol_len bits, one
+    bit more (an extra bit to drop) or one bit less (a dropped bit to insert).
+    """
+    (table, charset) = (SYMBOLS_7, CHARSET_7) if symbol_len == 7 else (SYMBOLS_5, CHARSET_5)
+    if len(chunk) == symbol_len:
+        variants = [chunk]
+    elif len(chunk) > symbol_len:
+        variants = [chunk[:i] + chunk[i + 1:] for i in range(len(chunk))]
+    else:
+        variants = [chunk[:i] + bit + chunk[i:] for i in range(len(chunk) + 1) for bit in "01"]
+    best = None
+    for variant in variants:
+        symbol = int(variant, 2)
+        (char, parity_ok) = table[symbol]
+        cost = (0 if parity_ok else PARITY_COST) + (0 if char in charset else CHARSET_COST)
+        if best is None or cost < best[0]:
+            best = (cost, symbol)
+    return best
+
+
+class TrackData(str):
+    """Decoded track data along with its integrity flags. Compares and prints
+    like the plain data string.
+    """
+
+    def __new__(cls, data: str, parity_errors: int = 0, end_sentinel: bool = False,
+                lrc_ok: bool = None, corrected: bool = False, slips: int = 0):
+        track = super().__new__(cls, data)
+        track.parity_errors = parity_errors  # Symbols with parity errors left
+        track.end_sentinel = end_sentinel  # End sentinel found
+        track.lrc_ok = lrc_ok  # LRC verified, None if there was no LRC to check or it was used up
+        track.corrected = corrected  # A symbol was reconstructed from the LRC
+        track.slips = slips  # Dropped/extra bits skipped by the bit slip recovery
+        return track
+
+    @property
+    def valid(self) -> bool:
+        # Realigned and corrected data is a best guess, check corrected to accept the latter
+        return (self.end_sentinel and self.lrc_ok is True and self.parity_errors == 0 and self.slips == 0
+                and not self.corrected)
+
+
 class Decoder(BaseDecoder):
 
-    def __init__(self, trackno) -> None:
+    def __init__(self, trackno, slip_recovery: bool = False, slip_band: int = 4) -> None:
         self._trackno = trackno # The track to use for the decoded data
+        self._slip_recovery = slip_recovery  # Realign imperfect swipes
+        self._slip_band = slip_band  # Max. net bits dropped/inserted
         super().__init__()
 
-    def __find_sync(self, trackno: int, data: str) -> int:
-        if trackno == 1:  # Only track 1 is alphanum
-            return self.__find_syncpattern(data=data, five_bit=False)
-        elif trackno == 2 or trackno == 3:
-            return self.__find_syncpattern(data=data, five_bit=True)
-        logger.warn("Invalid track number: %d", trackno)
-        return -1
-
-
-    def __find_syncpattern(self, data: str, five_bit: bool = True) -> int:
-        syncpattern = START_5  # Start sentinel ';' including parity
-        if not five_bit:
-            syncpattern = START_7
-        sync_start = data.find(syncpattern)
-        if sync_start < 0:
-            # No sync found
-            return -1
-
-        # Return the offset for data start
-        logger.debug("Start sentinel (%s) found", syncpattern)
-        return sync_start
-
-
-    def __decode_bits(self, offs: int, data: str, parity_odd: bool = True, five_bit: bool = True) -> str:
-        is_even = data.count("1") % 2 == 0 or False
-        if (parity_odd and is_even) or (not parity_odd and not is_even):
-            logger.error("Parity error at offset %d", offs)
-
-        if five_bit:
-            return BCD5_LSB[data[:4]]
-
-        # Calculate ASCII from DEC SIXBIT
-        bitval = 0
-        for (cnt, bit) in enumerate(reversed(data[:7])):
-            # print(cnt, bit)
-            if bit == "1":
-                bitval += 2 ** cnt
-        # print(bitval, bitval + 32, data[:7])
-        return chr(bitval + 32)
-
-    def __decode_chunk(self, trackno: int, offset: int, data: str) -> str:
-        if trackno == 1:
-            return self.__decode_bits(offset, data, five_bit=False)
-        elif trackno == 2 or trackno == 3:
-            return self.__decode_bits(offset, data, five_bit=True)
-        logger.warn("Invalid track number: %d", trackno)
-        return ""
-
-    def decode_bitstring(self, bitstring: str) -> tuple:
-
-        result = ""
+    def __symbol_table(self, symbol_len: int) -> list:
+        return SYMBOLS_7 if symbol_len == 7 else SYMBOLS_5
+
+    def __decode_symbols(self, offset: int, data: BitBuffer, symbol_len: int, limit: int = None) -> tuple:
+        """Splits the bits from offset into symbols up to the end sentinel, a
+        block at a time. Returns the symbols and the LRC symbol following the
+        end sentinel (None if there is none).
+        """
+        table = self.__symbol_table(symbol_len)
+        end_sentinel = sentinels[self._trackno][ES]
+        mask = (1 << symbol_len) - 1
+        count = (len(data) - offset - 1) // symbol_len  # Last symbol is never complete
+        if limit is not None:
+            count = min(count, limit)
+        symbols = []
+        for first in range(0, count, SYMBOL_BLOCK):
+            block_len = min(SYMBOL_BLOCK, count - first)
+            block_offset = offset + first * symbol_len
+            value = data[block_offset:block_offset + block_len * symbol_len].to_int()
+            block = [(value >> shift) & mask
+                     for shift in range((block_len - 1) * symbol_len, -1, -symbol_len)]
+            end = "".join(table[symbol][0] for symbol in block).find(end_sentinel)
+            if end < 0:
+                symbols += block
+                continue
+            symbols += block[:end + 1]
+            lrc_offset = offset + len(symbols) * symbol_len
+            if lrc_offset + symbol_len > len(data):
+                return (symbols, None)
+            return (symbols, data[lrc_offset:lrc_offset + symbol_len].to_int())
+        return (symbols, None)
+
+    def __lrc(self, symbols: list) -> int:
+        """Returns the longitudinal redundancy check of the symbols' data bits."""
+        lrc = 0
+        for symbol in symbols:
+            lrc ^= symbol >> 1  # Strip the parity bit
+        return lrc
+
+    def __has_end(self, symbols: list, table: list) -> bool:
+        return len(symbols) > 0 and table[symbols[-1]][0] == sentinels[self._trackno][ES]
+
+    def __score(self, symbols: list, lrc: int, symbol_len: int) -> int:
+        table = self.__symbol_table(symbol_len)
+        score = SCORE_PARITY_ERROR * sum(1 for symbol in symbols if not table[symbol][1])
+        if self.__has_end(symbols, table) and len(symbols) - 2 >= MIN_DATA_SYMBOLS:
+            score += SCORE_END
+            if lrc is not None and table[lrc][1] and lrc >> 1 == self.__lrc(symbols):
+                score += SCORE_LRC
+        return score
+
+    def __correctable(self, symbols: list, lrc: int, table: list) -> bool:
+        """Returns if the symbols have a single parity error the LRC can repair."""
+        return (self.__has_end(symbols, table) and lrc is not None and table[lrc][1]
+                and sum(1 for symbol in symbols if not table[symbol][1]) == 1)
+
+    def __correct_symbol(self, symbols: list, index: int, lrc: int) -> int:
+        """Reconstructs the symbol at index from the LRC and all other symbols."""
+        data = (lrc >> 1) ^ self.__lrc(symbols[:index] + symbols[index + 1:])
+        return (data << 1) | (data.bit_count() % 2 == 0)  # Odd parity
+
+    def __find_sync(self, data: BitBuffer, symbol_len: int) -> list:
+        """Searches the start sentinel in both swipe directions and returns the
+        plausible candidates as tuples (score, reversed, offset, bits, symbols,
+        lrc) in search order. The search stops at the first perfect candidate,
+        which has at least MIN_DATA_SYMBOLS.
+        """
+        syncpattern = START_7 if symbol_len == 7 else START_5
+        table = self.__symbol_table(symbol_len)
+        candidates = []
+        # The reversed copy is only made if the forward direction has no perfect candidate
+        for (reverse, bits) in ((reverse, data.reversed() if reverse else data) for reverse in (False, True)):
+            for (count, offset) in enumerate(bits.find_all(syncpattern)):
+                if count >= MAX_SYNC_CANDIDATES:
+                    break
+                (head, _) = self.__decode_symbols(offset, bits, symbol_len, limit=PRUNE_SYMBOLS)
+                if sum(1 for symbol in head if not table[symbol][1]) > PRUNE_MAX_ERRORS:
+                    continue
+                (symbols, lrc) = self.__decode_symbols(offset, bits, symbol_len)
+                score = self.__score(symbols, lrc, symbol_len)
+                logger.debug("Start sentinel (%s) candidate at %d%s, score %d",
+                             syncpattern, offset, " (reversed)" if reverse else "", score)
+                candidates.append((score, reverse, offset, bits, symbols, lrc))
+                if score == SCORE_PERFECT:
+                    return candidates
+        return candidates
+
+    def __realign(self, data: BitBuffer, offset: int, symbol_len: int) -> tuple:
+        """Finds the cheapest segmentation of the bits from offset into symbols
+        up to the end sentinel, allowing for dropped and extra bits. The search
+        keeps one state per net drift within the slip band, so it is linear in
+        the swipe length. Returns (symbols, lrc, slips, cost), None if no end
+        sentinel was reached.
+        """
+        bits = data.to_str()
+        table = self.__symbol_table(symbol_len)
+        end_sentinel = sentinels[self._trackno][ES]
+        band = self._slip_band
+        current = {0: (0, 0, 0)}  # Drift -> (cost, slips, running LRC)
+        back = []  # Per symbol: drift -> (previous drift, symbol, slipped)
+        best = None  # (cost, slips, symbol count, drift)
+        for k in range((len(bits) - offset) // symbol_len + band):
+            costs = {}
+            pointers = {}
+            for (drift, (cost, slips, lrc)) in current.items():
+                pos = offset + k * symbol_len + drift
+                for delta in (0, 1, -1):
+                    if abs(drift + delta) > band or pos + symbol_len + delta > len(bits):
+                        continue
+                    (symbol_cost, symbol) = _slip_symbol(bits[pos:pos + symbol_len + delta], symbol_len)
+                    total = (cost + symbol_cost + (SLIP_COST if delta != 0 else 0), slips + (delta != 0),
+                             lrc ^ (symbol >> 1))
+                    if drift + delta not in costs or total[:2] < costs[drift + delta][:2]:
+                        costs[drift + delta] = total
+                        pointers[drift + delta] = (drift, symbol, delta != 0)
+            if len(costs) == 0:
+                break
+            back.append(pointers)
+            current = {}
+            for (drift, (cost, slips, lrc)) in costs.items():
+                if table[pointers[drift][1]][0] != end_sentinel:
+                    current[drift] = (cost, slips, lrc)
+                    continue
+                # A path ends at an end sentinel, which has to be followed by the LRC
+                end = offset + (k + 1) * symbol_len + drift
+                if end + symbol_len > len(bits) or int(bits[end:end + symbol_len], 2) != \
+                        (lrc << 1) | (lrc.bit_count() % 2 == 0):
+                    cost += LRC_COST
+                if best is None or (cost, slips) < best[:2]:
+                    best = (cost, slips, k + 1, drift)
+            if best is not None and all(total[:2] >= best[:2] for total in current.values()):
+                break  # No open path can get cheaper
+
+        if best is None:
+            return None
+        (cost, slips, count, drift) = best
+        end = offset + count * symbol_len + drift
+        symbols = []
+        starts = [end]  # Bit position of each symbol, and the end
+        slipped = []
+        for k in range(count - 1, -1, -1):
+            (drift, symbol, slip) = back[k][drift]
+            if slip:
+                slipped.append(k)
+            symbols.append(symbol)
+            starts.append(offset + k * symbol_len + drift)
+        symbols.reverse()
+        starts.reverse()
+        lrc = int(bits[end:end + symbol_len], 2) if end + symbol_len <= len(bits) else None
+
+        # The exact position of a dropped or extra bit is a guess and may even
+        # be in the symbol before. For a single slip all variants around it
+        # are checked against the LRC, an unambiguous match is taken.
+        if len(slipped) == 1 and lrc is not None and table[lrc][1]:
+            first = max(slipped[0] - 1, 1)  # Keep the start sentinel
+            last = min(slipped[0] + 1, count - 1)  # Keep the end sentinel
+            resolved = self.__resolve_slip(symbols, first, last, bits[starts[first]:starts[last]], lrc, symbol_len)
+            if resolved is not None:
+                symbols = resolved
+        return (symbols, lrc, slips, cost)
+
+    def __resolve_slip(self, symbols: list, first: int, last: int, window: str, lrc: int, symbol_len: int) -> list:
+        """Tries every single bit deletion/insertion in the bits of the symbols
+        first to last (exclusive) and returns the symbols if exactly one variant
+        has valid parity and matches the LRC.
+        """
+        (table, charset) = (SYMBOLS_7, CHARSET_7) if symbol_len == 7 else (SYMBOLS_5, CHARSET_5)
+        length = (last - first) * symbol_len
+        if len(window) == length + 1:
+            variants = [window[:i] + window[i + 1:] for i in range(len(window))]
+        elif len(window) == length - 1:
+            variants = [window[:i] + bit + window[i:] for i in range(len(window) + 1) for bit in "01"]
+        else:
+            return None
+        matches = set()
+        for variant in variants:
+            replaced = tuple(int(variant[i:i + symbol_len], 2) for i in range(0, length, symbol_len))
+            if all(table[symbol][1] for symbol in replaced) and \
+                    lrc >> 1 == self.__lrc(symbols[:first] + list(replaced) + symbols[last:]):
+                matches.add(replaced)
+        if len(matches) > 1:  # Prefer the expected characters
+            matches = set(m for m in matches if all(table[symbol][0] in charset for symbol in m))
+        if len(matches) != 1:
+            return None
+        return symbols[:first] + list(matches.pop()) + symbols[last:]
+
+    def decode_bitstring(self, bitstring: BitBuffer) -> tuple:
+        if isinstance(bitstring, str):  # Plain bitstring of '0'/'1'
+            bitstring = BitBuffer.from_str(bitstring)
+
         trackdata = [None, None, None]
         symbol_len = -1
         if self._trackno == 1:
@@ -171,23 +446,193 @@ class Decoder(BaseDecoder):
             logger.error("Invalid track number: %d", self._trackno)
             return ""
 
-        data_offset = self.__find_sync(self._trackno, bitstring)
-        if data_offset < 1:
+        candidates = self.__find_sync(bitstring, symbol_len)
+        if len(candidates) == 0:
             logger.warning("No sync found, maybe bitstring is not in isoformat") # -> Custom decoder?
             return ""
 
+        # The longer track on equal scores
+        (score, reverse, data_offset, bits, symbols, lrc) = max(candidates, key=lambda c: (c[0], len(c[4])))
+        table = self.__symbol_table(symbol_len)
+        slips = 0
+        if self._slip_recovery and score < SCORE_PERFECT:
+            # The best candidates are realigned, a slip can leave the right
+            # start sentinel with a worse score than a bit pattern in the data.
+            # The plain segmentation is one of the paths searched, so slips are
+            # only reported if they are cheaper than e.g. a parity error. The
+            # realigned symbols have to improve on the parity and LRC of the
+            # best candidate. If the LRC can repair that one, they have to
+            # match the LRC and not end before it.
+            (least, length) = (score + 1, 0)
+            if self.__correctable(symbols, lrc, table):
+                (least, length) = (SCORE_PERFECT, len(symbols))
+            ranked = sorted(candidates, key=lambda c: (c[0], len(c[4])), reverse=True)
+            best = None  # ((score, -cost), reverse, offset, realigned)
+            for (_, c_reverse, c_offset, c_bits, _, _) in ranked[:MAX_REALIGN]:
+                realigned = self.__realign(c_bits, c_offset, symbol_len)
+                if realigned is None or realigned[2] == 0 or realigned[3] > MAX_REALIGN_COST \
+                        or len(realigned[0]) < length:
+                    continue
+                key = (self.__score(realigned[0], realigned[1], symbol_len), -realigned[3])
+                if key[0] >= least and (best is None or key > best[0]):
+                    best = (key, c_reverse, c_offset, realigned)
+            if best is not None:
+                (_, reverse, data_offset, (symbols, lrc, slips, _)) = best
+                logger.info("Realigned symbols, %d bit slips", slips)
+
+        if reverse:
+            logger.info("Reverse swipe detected")
         logger.debug("Data starts at position %d", data_offset)
 
-        while data_offset + symbol_len < len(bitstring):
-            result += self.__decode_chunk(self._trackno, data_offset,
-                                    bitstring[data_offset:data_offset+symbol_len])
-            data_offset += symbol_len
-            if result.endswith(sentinels[self._trackno][ES]):
-                logger.debug("Data ends at position %d", data_offset + symbol_len)
+        errors = []
+        for (i, symbol) in enumerate(symbols):
+            if not table[symbol][1]:
+                logger.error("Parity error at offset %d", data_offset + i * symbol_len)
+                errors.append(i)
+        has_end = self.__has_end(symbols, table)
+        if has_end:
+            logger.debug("Data ends at position %d", data_offset + (len(symbols) + 1) * symbol_len)
+
+        # The LRC follows the end sentinel, its data bits are the XOR of the
+        # data bits of all symbols. A single parity error can be corrected with it.
+        lrc_ok = None
+        corrected = False
+        if has_end and lrc is None:
+            logger.warning("No LRC after end sentinel")
+        elif has_end and not table[lrc][1]:
+            logger.error("Parity error in LRC")
+            lrc_ok = False
+        elif has_end:
+            if len(errors) == 1:
+                symbols = list(symbols)
+                symbols[errors[0]] = self.__correct_symbol(symbols, errors[0], lrc)
+                logger.info("Symbol at offset %d corrected by LRC",
+                            data_offset + errors[0] * symbol_len)
+                errors = []
+                corrected = True
+                # The LRC was used up for the repair, it matches by construction
+                # and can not tell about errors parity missed
+            else:
+                lrc_ok = lrc >> 1 == self.__lrc(symbols)
+                if not lrc_ok:
+                    logger.error("LRC mismatch")
+
+        result = "".join(table[symbol][0] for symbol in symbols)
+        trackdata[self._trackno - 1] = TrackData(result, parity_errors=len(errors), end_sentinel=has_end,
+                                                 lrc_ok=lrc_ok, corrected=corrected, slips=slips)
+        return tuple(trackdata)
+
+# Events of the StreamDecoder
+EVENT_SYNC = "sync"  # Start sentinel found
+EVENT_LOST = "lost"  # Start sentinel dropped, the characters so far are void
+EVENT_CHAR = "char"  # Data character (or field separator)
+EVENT_END = "end"  # End sentinel
+EVENT_LRC = "lrc"  # LRC symbol after the end sentinel
+
+
+class StreamEvent(NamedTuple):
+    kind: str  # One of EVENT_*
+    offset: int  # Bit position of the symbol in the swipe
+    char: str = None
+    ok: bool = None  # Symbol parity, for EVENT_LRC if the LRC matches
+
+
+class StreamDecoder:
+    """Decodes a swipe while its bits arrive. feed() returns the events of the
+    symbols completed by the new bits, finish() returns the track data like
+    Decoder.decode_bitstring() once the card left the head.
+
+    Only the forward direction is decoded on the fly, locked to the first
+    plausible start sentinel. If that does not give a clean track (end
+    sentinel, matching LRC, no parity errors, MIN_DATA_SYMBOLS), finish()
+    decodes all bits with the Decoder, so the result is always the same.
+    """
+
+    def __init__(self, trackno: int, slip_recovery: bool = False, slip_band: int = 4) -> None:
+        self._decoder = Decoder(trackno, slip_recovery, slip_band)
+        self._trackno = trackno
+        (self._symbol_len, self._table, self._syncpattern) = \
+            (7, SYMBOLS_7, START_7) if trackno == 1 else (5, SYMBOLS_5, START_5)
+        self._bits = BitBuffer()
+        self._scan = 0  # Sync search position
+        self._candidates = 0
+        self._offset = None  # Next symbol, None while not synced
+        self._chars = []
+        self._errors = 0
+        self._lrc = 0  # Running LRC of the data bits
+        self._end = False  # End sentinel seen, the next symbol is the LRC
+        self._lrc_ok = None
+        self._done = False
+
+    @property
+    def bitcount(self) -> int:
+        return len(self._bits)
+
+    def feed(self, bits) -> list:
+        """Adds bits (bit buffer, bitstring or 0/1 values) and returns the
+        new events.
+        """
+        self._bits.extend(bits)
+        events = []
+        while not self._done:
+            if self._offset is None and not self.__sync(events):
+                break
+            if self._offset + self._symbol_len > len(self._bits):
                 break
+            self.__symbol(events)
+        return events
+
+    def __sync(self, events: list) -> bool:
+        if self._candidates >= MAX_SYNC_CANDIDATES:
+            return False
+        pos = self._bits.find(self._syncpattern, self._scan)
+        if pos < 0:
+            self._scan = max(self._scan, len(self._bits) - len(self._syncpattern) + 1)
+            return False
+        self._offset = pos
+        self._scan = self._offset + 1
+        self._candidates += 1
+        self._chars = []
+        self._errors = 0
+        self._lrc = 0
+        self._end = False
+        events.append(StreamEvent(EVENT_SYNC, self._offset))
+        return True
+
+    def __symbol(self, events: list) -> None:
+        offset = self._offset
+        symbol = self._bits[offset:offset + self._symbol_len].to_int()
+        self._offset += self._symbol_len
+        (char, parity_ok) = self._table[symbol]
+        if self._end:
+            self._lrc_ok = parity_ok and symbol >> 1 == self._lrc
+            events.append(StreamEvent(EVENT_LRC, offset, char, self._lrc_ok))
+            self._done = True
+            return
+        self._chars.append(char)
+        self._lrc ^= symbol >> 1
+        if not parity_ok:
+            self._errors += 1
+            # Same plausibility check as the Decoder's sync search
+            if len(self._chars) <= PRUNE_SYMBOLS and self._errors > PRUNE_MAX_ERRORS:
+                self._offset = None
+                events.append(StreamEvent(EVENT_LOST, offset))
+                return
+        if char == sentinels[self._trackno][ES]:
+            self._end = True
+            events.append(StreamEvent(EVENT_END, offset, char, parity_ok))
+        else:
+            events.append(StreamEvent(EVENT_CHAR, offset, char, parity_ok))
+
+    def finish(self) -> tuple:
+        clean = self._done and self._lrc_ok and self._errors == 0
+        if clean and len(self._chars) - 2 >= MIN_DATA_SYMBOLS:
+            trackdata = [None, None, None]
+            trackdata[self._trackno - 1] = TrackData("".join(self._chars), end_sentinel=True, lrc_ok=True)
+            return tuple(trackdata)
+        logger.debug("Stream not decoded cleanly, decoding all %d bits", len(self._bits))
+        return self._decoder.decode_bitstring(self._bits)
 
-        trackdata[self._trackno - 1] = result
-        return tuple(trackdata)
 
 class Parser(BaseParser):
     def process_trackdata(self, trackdata: tuple) -> tuple:
@@ -199,22 +644,12 @@ class Parser(BaseParser):
                 continue
             if trackno == 1:
                 # r"^%B([0-9]{1,19})\^([^\^]{2,26})\^([0-9]{4}|\^)([0-9]{3}|\^)([^\?]*)\?$"
-                matcher = re.match(r"^%(?P<FC>[A-Z])(?P<PAN>[0-9]{1,19})\^(?P<CC>[0-9]{3})?(?P<NM>[^\^]{2,26})\^(?P<ED>[0-9]{4}|\^)(?P<SC>[0-9]{3}|\^)(?P<PVV>[0-9]{5})(?P<DD>[^\?]*)\?$", data)
-                if not matcher:
-                    logger.warn("Non-ISO 7813 track 1 format: '%s'", data)
+                try:
+                    result = TRACK1_FORMAT.parse(data)
+                except FieldError as e:
+                    logger.warn("Non-ISO 7813 track 1 format, %s: '%s'", e, data)
                     continue
                 logger.debug("ISO 7813 track 1 data: %s", data)
-                result = {
-                    "trackno" : 1, # inline signal track
-                    "FC": matcher.group("FC"), # Format code
-                    "PAN": matcher.group("PAN"), # Primary account number
-                    "CC" : matcher.group("CC"), # Country code
-                    "NM": matcher.group("NM"), # Name
-                    "ED" : matcher.group("ED"), # Expiry data
-                    "SC" : matcher.group("SC"), # Service code
-                    "PVV" : matcher.group("PVV"), # PIN verification value
-                    "DD" : matcher.group("DD") # Discretionary data
-                }
             elif trackno == 2:
                 # matcher = re.match(r"\;(.+)\?", data) # use sentinels
                 # if not matcher:
@@ -222,9 +657,10 @@ class Parser(BaseParser):
                 #     return
                 # # fields = matcher.group(1).split(sentinels[trackno][FS])
 
-                matcher = re.match(r"^\;(?P<PAN>[0-9]{1,19})\=(?P<ED>[0-9]{4}|\=)(?P<SC>[0-9]{3}|\=)(?P<PVV>[0-9]{5})(?P<DD>[^\?]*)\?$", data)
-                if not matcher:
-                    logger.warn("Non-ISO 7813 track 2 format: '%s'", data)
+                try:
+                    result = TRACK2_FORMAT.parse(data)
+                except FieldError as e:
+                    logger.warn("Non-ISO 7813 track 2 format, %s: '%s'", e, data)
                     continue
                 logger.debug("ISO 7813 track 2 data: %s", data)
                 # matcher = re.match(r"^\;([0-9]{1,19})\=([^\?]*)\?$")
@@ -239,15 +675,6 @@ class Parser(BaseParser):
                 # elif len(CCED) == 7:
                 #     CC = int(CCED[:3])
                 #     ED = int(CCED[:4])
-                result = {
-                    "trackno" : 2, # inline signal track
-                    "PAN": matcher.group("PAN"), # Primary account number
-                    "CC" : None, # Country code
-                    "ED" : matcher.group("ED"), # Expiry data
-                    "SC" : matcher.group("SC"), # Service code
-                    "PVV" : matcher.group("PVV"), # PIN verification value
-                    "DD" : matcher.group("DD") # Discretionary data
-                }
 
             track_details[trackno - 1] = result
         return tuple(track_details)
@@ -270,14 +697,14 @@ class Printer(BasePrinter):
             # else:
             #    print(f"Printing details for track {trackno} not yet implemented")
 
-    def __print_track1_data(self, data: dict, pan_details: bool=False, sc_details: bool=False):
+    def __print_track1_data(self, data: Track1Details, pan_details: bool=False, sc_details: bool=False):
         print(f"Primary account number: {data['PAN']} (valid: {check_luhn(data['PAN'])})")
         if pan_details:
             iso7812.print_pan_details(data['PAN'])
         print(f"Name:                  '{data['NM']}'")
         if self._print_verbose and not " /" == data['NM']:
             # Print name details
-            name_matcher = re.match(r"^(?P<SURNAME>[^\/]+)\/?(?P<FIRSTNAME>[^\.]*)(?P<TITLE>[\.]*)$", data["NM"])
+            name_matcher = NAME_FORMAT.match(data["NM"])
 
             print(f"  Surname:         {name_matcher['SURNAME']}")
             print(f"  Firstname:       {name_matcher['FIRSTNAME']}")
@@ -292,7 +719,7 @@ class Printer(BasePrinter):
         print(f"PIN verification value: {data['PVV']}")
         print(f"Discretionary data:     {data['DD']}")
 
-    def __print_track2_data(self, data: dict, pan_details: bool=False, sc_details: bool=False):
+    def __print_track2_data(self, data: Track2Details, pan_details: bool=False, sc_details: bool=False):
         print(f"Primary account number: {data['PAN']} (valid: {check_luhn(data['PAN'])})")
         if pan_details:
             iso7812.print_pan_details(data['PAN'])
@@ -305,3 +732,5 @@ class Printer(BasePrinter):
         print(f"PIN verification value: {data['PVV']}")
         print(f"Discretionary data:     {data['DD']}")
 
+
+registry.register("iso7813", (1, 2), Parser, Printer, {1: TRACK1_FORMAT.names, 2: TRACK2_FORMAT.names})
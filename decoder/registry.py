@@ -0,0 +1,58 @@
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class Processor(NamedTuple):
+    name: str
+    tracks: tuple  # Track numbers the processor handles
+    parser: type  # BaseParser subclass
+    printer: type  # BasePrinter subclass, gets print_verbose
+    fields: dict  # Track number -> names of the fields its parser returns
+
+
+# Dispatch table, (trackno, name) -> Processor
+_processors = {}
+
+
+def register(name: str, tracks: tuple, parser: type, printer: type, fields: dict = None) -> None:
+    """Registers a track format processor, e.g. at the end of its module. Its
+    grammar should be compiled at import, instances are created by build().
+    fields names the fields per track for the export schema.
+    """
+    processor = Processor(name, tuple(tracks), parser, printer, dict(fields or {}))
+    for trackno in processor.tracks:
+        if (trackno, name) in _processors:
+            logger.warning("Processor %s for track %d registered again", name, trackno)
+        _processors[(trackno, name)] = processor
+
+
+def names(trackno: int) -> list:
+    """Returns the names of the processors registered for the track."""
+    return sorted(name for (t, name) in _processors if t == trackno)
+
+
+def build(selection: tuple, print_verbose: bool = False) -> tuple:
+    """Returns a (parser, printer) per track for the processor names selected
+    per track (None for no processor). A processor used for several tracks is
+    instantiated once.
+    """
+    instances = {}
+    result = []
+    for (trackno, name) in enumerate(selection, 1):
+        if name is None:
+            result.append((None, None))
+            continue
+        processor = _processors.get((trackno, name))
+        if processor is None:
+            raise ValueError(f"Unsupported processor for track {trackno}: {name}")
+        if name not in instances:
+            instances[name] = (processor.parser(), processor.printer(print_verbose=print_verbose))
+        result.append(instances[name])
+    return tuple(result)
+
+
+def get(trackno: int, name: str) -> Processor:
+    """Returns the processor registered for the track, None if there is none."""
+    return _processors.get((trackno, name))
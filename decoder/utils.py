@@ -1,12 +1,45 @@
 import logging
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 logger = logging.getLogger(__name__)
 
+# Luhn: every second digit from the right, before the check digit, is
+# doubled and its digits summed
+DOUBLE_DIGITS = str.maketrans("0123456789", "0246813579")
+DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
 
-def check_luhn(number: int) -> bool:  # Luhn check
-    return check_luhn(str(number))
+def check_luhn(number, check_digit: int = 0) -> bool:  # Luhn check
+    """Checks a card number (str or int) like the Luhn algorithm, the sum of
+    its digits modulo 10 has to be check_digit.
+    """
+    number = str(number)
+    digits = (number[-1::-2] + number[-2::-2].translate(DOUBLE_DIGITS)).encode("ascii")
+    if digits and not digits.isdigit():
+        raise ValueError(f"Not a card number: {number}")
+    return check_digit == (sum(digits) - len(digits) * ord("0")) % 10
 
 
-def check_luhn(number: str, check_digit: int = 0) -> bool:  # Luhn check
-    digits = list(map(int, number))
-    return check_digit == sum(digits + [d + (d > 4) for d in digits[-2::-2]]) % 10
+def check_luhn_many(numbers, check_digit: int = 0):
+    """Checks many card numbers of mixed lengths at once like check_luhn().
+    Returns a numpy bool array, a list without numpy. Empty numbers, None and
+    numbers with other characters than digits fail instead of raising.
+    """
+    numbers = [("" if number is None else str(number)) for number in numbers]
+    if np is None:
+        return [number.isdigit() and check_luhn(number, check_digit) for number in numbers]
+    if not numbers:
+        return np.zeros(0, dtype=bool)
+    # Right aligned digit matrix, the leading zeros do not change the sum
+    width = max(1, max(map(len, numbers)))
+    data = "".join(number.rjust(width, "0") for number in numbers).encode("ascii", "replace")
+    digits = np.frombuffer(data, dtype=np.uint8).reshape(len(numbers), width) - ord("0")
+    valid = (digits <= 9).all(axis=1) & np.fromiter((len(n) > 0 for n in numbers), bool, len(numbers))
+    digits = np.where(valid[:, None], digits, 0)
+    doubled = (np.arange(width) % 2) == (width % 2)  # Every second column from the right
+    weighted = np.where(doubled, np.asarray(DOUBLED, dtype=np.uint8)[digits], digits)
+    return valid & (weighted.sum(axis=1, dtype=np.int64) % 10 == check_digit)
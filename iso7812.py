@@ -1,3 +1,22 @@
+import argparse
+import bisect
+import csv
+import functools
+import heapq
+import logging
+import mmap
+import os
+import struct
+import sys
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
 MII_DETAILS = {}
 MII_DETAILS["0"]  = "Reserved for future use by ISO/TC 68."
 MII_DETAILS["00"] = "Institutions other than card issuers."
@@ -13,7 +32,168 @@ MII_DETAILS["8"]  = "Telecommunications and other future assignments."
 MII_DETAILS["89"] = "Telecommunications administrations and private operating agencies."
 MII_DETAILS["9"]  = "Reserved for national use."
 
-PAN_DETAILS = {}
+# IIN range index: a header, the range starts and ends as u64 (PAN prefixes
+# padded to PAN_DIGITS), the string numbers of the issuer, brand and country
+# per range, then the string table (offsets, utf-8 data).
+INDEX_MAGIC = b"IINX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sBxxxII")  # Magic, version, ranges, strings
+PAN_DIGITS = 19  # Longest PAN, 10**19 - 1 fits a u64
+ISSUER_CACHE = 65536  # Decoded ranges kept
+FIELDS = ("issuer", "brand", "country")
+
+
+class Issuer(NamedTuple):
+    issuer: str
+    brand: str
+    country: str
+
+
+def _pan_key(pan: str, fill: str = "0") -> int:
+    return int(pan[:PAN_DIGITS].ljust(PAN_DIGITS, fill))
+
+
+def _flatten(ranges: list) -> list:
+    """Returns disjoint (low, high, record) ranges, the narrowest range wins
+    where ranges overlap. Neighbours of the same record are merged.
+    """
+    bounds = sorted({low for (low, _, _) in ranges} | {high + 1 for (_, high, _) in ranges})
+    ranges = sorted(ranges)
+    result = []
+    active = []  # Heap of (width, position, high, record)
+    i = 0
+    for (start, end) in zip(bounds, bounds[1:]):
+        while i < len(ranges) and ranges[i][0] <= start:
+            (low, high, record) = ranges[i]
+            heapq.heappush(active, (high - low, i, high, record))
+            i += 1
+        while active and active[0][2] < start:
+            heapq.heappop(active)
+        if not active:
+            continue
+        record = active[0][3]
+        if result and result[-1][2] == record and result[-1][1] == start - 1:
+            result[-1] = (result[-1][0], end - 1, record)
+        else:
+            result.append((start, end - 1, record))
+    return result
+
+
+def compile_index(csv_path: str, index_path: str) -> int:
+    """Compiles a CSV of IIN ranges (columns low, high, issuer, brand,
+    country, high may be empty for a single prefix) into an index file.
+    Returns the number of ranges.
+    """
+    strings = {}
+    ranges = []
+    with open(csv_path, newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            low = row["low"].strip()
+            high = (row.get("high") or "").strip() or low
+            if not low.isdigit() or not high.isdigit():
+                logger.warning("Skipping IIN range %s-%s", low, high)
+                continue
+            record = tuple(strings.setdefault((row.get(field) or "").strip(), len(strings)) for field in FIELDS)
+            ranges.append((_pan_key(low), _pan_key(high, "9"), record))
+    ranges = _flatten(ranges)
+    data = [text.encode("utf-8") for text in strings]
+    offsets = [0]
+    for text in data:
+        offsets.append(offsets[-1] + len(text))
+    with open(index_path, "wb") as fh:
+        fh.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(ranges), len(data)))
+        fh.write(struct.pack(f"<{len(ranges)}Q", *(low for (low, _, _) in ranges)))
+        fh.write(struct.pack(f"<{len(ranges)}Q", *(high for (_, high, _) in ranges)))
+        fh.write(struct.pack(f"<{len(ranges) * 3}I", *(i for (_, _, record) in ranges for i in record)))
+        fh.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        fh.write(b"".join(data))
+    logger.info("Compiled %d IIN ranges to %s", len(ranges), index_path)
+    return len(ranges)
+
+
+class IinIndex:
+    """IIN range index file, memory-mapped. Lookups bisect the range starts
+    in place, nothing is loaded up front.
+    """
+
+    def __init__(self, path: str) -> None:
+        if sys.byteorder != "little":
+            raise ValueError("IIN index needs a little endian host")
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self._count, strings) = INDEX_HEADER.unpack_from(self._mmap)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Not an IIN index (version {INDEX_VERSION}): {path}")
+        view = memoryview(self._mmap)
+        pos = INDEX_HEADER.size
+        self._lows = view[pos:pos + self._count * 8].cast("Q")
+        pos += self._count * 8
+        self._highs = view[pos:pos + self._count * 8].cast("Q")
+        pos += self._count * 8
+        self._records = view[pos:pos + self._count * 12].cast("I")
+        pos += self._count * 12
+        self._offsets = view[pos:pos + (strings + 1) * 4].cast("I")
+        self._strings = pos + (strings + 1) * 4
+        self._issuer = functools.lru_cache(maxsize=ISSUER_CACHE)(self.__issuer)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __string(self, i: int) -> str:
+        start = self._strings + self._offsets[i]
+        return self._mmap[start:start + self._offsets[i + 1] - self._offsets[i]].decode("utf-8")
+
+    def __issuer(self, i: int) -> Issuer:
+        return Issuer(*(self.__string(self._records[i * 3 + field]) for field in range(3)))
+
+    def lookup(self, pan: str) -> Issuer:
+        """Returns the issuer of the PAN, None if it is in no range."""
+        if not pan or not pan.isdigit():
+            return None
+        key = _pan_key(pan)
+        i = bisect.bisect_right(self._lows, key) - 1
+        if i < 0 or key > self._highs[i]:
+            return None
+        return self._issuer(i)
+
+    def lookup_many(self, pans) -> list:
+        """Returns the issuer (or None) of each PAN, searched in one go with
+        numpy.
+        """
+        pans = list(pans)
+        if np is None or self._count == 0:
+            return [self.lookup(pan) for pan in pans]
+        valid = [bool(pan) and pan.isdigit() for pan in pans]
+        keys = np.fromiter((_pan_key(pan) if ok else 0 for (pan, ok) in zip(pans, valid)), np.uint64, len(pans))
+        lows = np.frombuffer(self._lows, dtype=np.uint64)
+        highs = np.frombuffer(self._highs, dtype=np.uint64)
+        found = np.searchsorted(lows, keys, side="right") - 1
+        hit = (found >= 0) & (keys <= highs[np.maximum(found, 0)]) & np.array(valid, dtype=bool)
+        return [self._issuer(i) if ok else None for (i, ok) in zip(found.tolist(), hit.tolist())]
+
+
+_index = None  # Loaded by load_index()
+
+
+def load_index(path: str) -> IinIndex:
+    """Loads the IIN index used for the PAN details. A CSV file is compiled
+    next to it first, unless the compiled index is up to date.
+    """
+    global _index
+    if path.endswith(".csv"):
+        index_path = path[:-4] + ".iin"
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+            compile_index(path, index_path)
+        path = index_path
+    _index = IinIndex(path)
+    logger.debug("Loaded %d IIN ranges from %s", len(_index), path)
+    return _index
+
+
+def lookup(pan: str) -> Issuer:
+    """Returns the issuer of the PAN from the loaded index, None if unknown."""
+    return _index.lookup(pan) if _index is not None else None
+
 
 def print_pan_details(pan: str):
     MII = pan[0]
@@ -32,8 +212,23 @@ def print_pan_details(pan: str):
     IAI = pan[offs+remaining:-1]
     CD = pan[-1:]
 
+    issuer = lookup(pan)
+
     print(f"  MII: {MII} -> {MII_DETAILS[MII]}")
-    print(f"  IIN: {II} -> ?")
+    print(f"  IIN: {II} -> {f'{issuer.issuer} ({issuer.brand})' if issuer else '?'}")
     print(f"  CC:  {CC} -> ?")
+    print(f"  Country: {issuer.country if issuer else '?'}")
     print(f"  IAI:  {IAI}")
     print(f"  CD:  {CD}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compiles a CSV of IIN ranges into an index for --iin-index")
+    ap.add_argument("csv_file")
+    ap.add_argument("index_file")
+    args = ap.parse_args()
+    print(f"{compile_index(args.csv_file, args.index_file)} ranges")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
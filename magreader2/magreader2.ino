@@ -1,7 +1,24 @@
 const int CRD_PIN = 2;
 const int CLK_PIN = 3;
 const int DAT_PIN = 4;
-String bitstring = ""; // contains the raw read bits
+
+// 0: text lines ("info: bits: 0101..."), 1: binary frames (see below)
+#define BINARY_PROTOCOL 0
+// The binary protocol works well with e.g. 115200, set the host accordingly
+#define BAUDRATE 9600
+
+// Binary frame: MAGIC, VERSION, TYPE, LEN (u16 LE), payload, CRC (u16 LE)
+// The CRC-16/CCITT (poly 0x1021, init 0xffff) covers VERSION up to the payload
+#define FRAME_MAGIC 0xA5
+#define FRAME_VERSION 1
+#define FRAME_INSERT 1  // No payload
+#define FRAME_REMOVE 2  // No payload
+#define FRAME_BITS 3    // Bit count (u16 LE), bits packed MSB first
+#define FRAME_DEBUG 4   // ASCII text
+
+#define MAX_BITS 2048
+uint8_t bits[MAX_BITS / 8]; // contains the raw read bits, packed
+unsigned int bitcount = 0;
 
 void setup() {
   pinMode(CRD_PIN, INPUT_PULLUP);
@@ -11,10 +28,64 @@ void setup() {
   // Display via LED if a card is read by the reader
   pinMode(LED_BUILTIN, OUTPUT);
   digitalWrite(LED_BUILTIN, LOW);
-  Serial.begin(9600);
+  Serial.begin(BAUDRATE);
   while(!Serial){};
 }
 
+uint16_t crcUpdate(uint16_t crc, uint8_t data) {
+  crc ^= (uint16_t)data << 8;
+  for (int i = 0; i < 8; i++) {
+    crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  }
+  return crc;
+}
+
+uint16_t writeCrc(uint16_t crc, const uint8_t *data, unsigned int len) {
+  Serial.write(data, len);
+  for (unsigned int i = 0; i < len; i++) {
+    crc = crcUpdate(crc, data[i]);
+  }
+  return crc;
+}
+
+// The payload is sent in two parts to avoid copying the bits
+void sendFrame(uint8_t type, const uint8_t *head, unsigned int headLen,
+               const uint8_t *data, unsigned int dataLen) {
+  unsigned int len = headLen + dataLen;
+  uint8_t header[4] = {FRAME_VERSION, type, (uint8_t)(len & 0xff), (uint8_t)(len >> 8)};
+  Serial.write(FRAME_MAGIC);
+  uint16_t crc = writeCrc(0xffff, header, sizeof(header));
+  crc = writeCrc(crc, head, headLen);
+  crc = writeCrc(crc, data, dataLen);
+  Serial.write((uint8_t)(crc & 0xff));
+  Serial.write((uint8_t)(crc >> 8));
+}
+
+void sendDebug(const char *text) {
+  if (BINARY_PROTOCOL) {
+    sendFrame(FRAME_DEBUG, (const uint8_t *)text, strlen(text), NULL, 0);
+  } else {
+    Serial.print("debug: ");
+    Serial.println(text);
+  }
+}
+
+void sendBits() {
+  if (BINARY_PROTOCOL) {
+    uint8_t count[2] = {(uint8_t)(bitcount & 0xff), (uint8_t)(bitcount >> 8)};
+    sendFrame(FRAME_BITS, count, sizeof(count), bits, (bitcount + 7) / 8);
+    return;
+  }
+  Serial.print("info: bits: ");
+  for (unsigned int i = 0; i < bitcount; i++) {
+    Serial.write((bits[i / 8] & (0x80 >> (i % 8))) ? '1' : '0');
+  }
+  Serial.println();
+  Serial.print("debug: bitcount: ");
+  Serial.println(bitcount);
+  Serial.println("info: read end"); // End marker
+}
+
 int cardIn = 0;
 int lastCardIn = 0;
 
@@ -25,18 +96,23 @@ void loop() {
   cardIn = !digitalRead(CRD_PIN);  // negative logic
   if (cardIn & !lastCardIn) {
     digitalWrite(LED_BUILTIN, HIGH);
-    Serial.println("info: card inserted");
+    if (BINARY_PROTOCOL) {
+      sendFrame(FRAME_INSERT, NULL, 0, NULL, 0);
+    } else {
+      Serial.println("info: card inserted");
+    }
   } else if (!cardIn & lastCardIn) {
     digitalWrite(LED_BUILTIN, LOW);
-    Serial.println("info: card removed");
-    Serial.print("info: bits: ");
-    Serial.println(bitstring);
-    Serial.print("debug: bitcount: ");
-    Serial.println(bitstring.length());
-    Serial.println("info: read end"); // End marker
+    if (BINARY_PROTOCOL) {
+      sendFrame(FRAME_REMOVE, NULL, 0, NULL, 0);
+    } else {
+      Serial.println("info: card removed");
+    }
+    sendBits();
     Serial.flush();
     // Reset the variables for next reading
-    bitstring = "";
+    memset(bits, 0, sizeof(bits));
+    bitcount = 0;
     lastClock = -1;  // Reset clockstate
     delay(1000);     // Debounce
   }
@@ -48,13 +124,18 @@ void loop() {
 
   clock = digitalRead(CLK_PIN);
   if (lastClock == -1) {
-    Serial.println("debug: clockinit");
+    sendDebug("clockinit");
     lastClock = clock;
     return;
   } else if (!(lastClock == HIGH & clock == LOW)) { // all but negative edge
     lastClock = clock;
     return;
   }
-  bitstring += !digitalRead(DAT_PIN); // Read the (inverted) bit on negative clock edge
+  if (bitcount < MAX_BITS) {
+    if (!digitalRead(DAT_PIN)) { // Read the (inverted) bit on negative clock edge
+      bits[bitcount / 8] |= 0x80 >> (bitcount % 8);
+    }
+    bitcount++;
+  }
   lastClock = clock;
 }
@@ -1,43 +1,285 @@
 import argparse
+import asyncio
+import contextlib
 import logging
 import sys
+import time
 
 import decoder.raw.iso7813 as iso7813
 import iso7812
 import rawreader.datareader as datareader
-from decoder import bahn, girocard, iso4909, noop
-from decoder.plain import msr100
-from rawreader import basereader, sigrok
+from decoder import auto, bahn, batch, export, girocard, iso4909, noop, registry
+from decoder.plain import keylog, msr100
+from rawreader import basereader, fanin, sigrok
 
 logger = logging.getLogger()
 
 
+def decode_bitstring(args, bitstring: str) -> tuple:
+    dec = iso7813.Decoder(args.input_track, args.slip_recovery, args.slip_band)  # Decode as track n
+    trackdata = dec.decode_bitstring(bitstring)
+    print_decoded(args, trackdata)
+    return trackdata
+
+
+def print_decoded(args, trackdata: tuple):
+    if not isinstance(trackdata, tuple):  # No sync found
+        print("No track data decoded")
+        return
+    print(f"Decoded track {args.input_track} data: '{trackdata[1]}'")
+    track = trackdata[args.input_track - 1]
+    if isinstance(track, iso7813.TrackData):
+        print(f"Integrity: LRC ok: {track.lrc_ok}, parity errors: {track.parity_errors}, "
+              f"end sentinel: {track.end_sentinel}, corrected: {track.corrected}")
+
+
+def get_selection(args) -> tuple:
+    """Returns the processor names selected per track, None for none."""
+    return (args.track1_processor, args.track2_processor, args.track3_processor)
+
+
+def get_processors(args) -> tuple:
+    """Returns the (parser, printer) per track, looked up in the processor
+    registry and built once per run.
+    """
+    return registry.build(get_selection(args), print_verbose=args.print_verbose)
+
+
+def process_trackdata(args, trackdata: tuple):
+    track_details = [None, None, None]
+    for (trackno, track) in enumerate(trackdata, 1):
+        (parser, printer) = args.processors[trackno - 1]
+        if parser is None:
+            continue
+
+        trackdata_copy = [None, None, None]
+        trackdata_copy[trackno - 1] = track
+        trackdata_details = parser.process_trackdata(tuple(trackdata_copy))
+        track_details[trackno - 1] = trackdata_details[trackno - 1]
+        if printer is not None:
+            printer.print_trackdata(trackdata_details)
+
+    if args.sink is not None:
+        args.sink.write_swipe(tuple(track_details))
+
+
+def process_batch(args):
+    """Decodes and parses all swipes of the input on a process pool, the
+    results are printed in capture order.
+    """
+    if args.input == "sigrok_stream":
+        swipes = sigrok.StreamCsvReader(args.input_file).read_swipes()
+    elif args.input == "oneline":
+        swipes = datareader.EachLine(args.input_file).read_swipes()
+    else:
+        print(f"Unsupported input for batch mode: {args.input}")
+        sys.exit(1)
+
+    processors = args.processors
+    parsers = tuple(parser for (parser, _) in processors)
+    dec = iso7813.Decoder(args.input_track, args.slip_recovery, args.slip_band)  # Decode as track n
+    for result in batch.decode_swipes(swipes, dec, parsers, jobs=args.jobs):
+        if result.error is not None:
+            print(f"Error decoding swipe {result.index}: {result.error}")
+            continue
+        print(f"Swipe {result.index}: decoded track {args.input_track} data: '{
+              result.trackdata[args.input_track - 1]}'")
+        track_details = [None, None, None]
+        for (trackno, (_, printer)) in enumerate(processors, 1):
+            trackdata_details = result.track_details[trackno - 1]
+            if trackdata_details is None:
+                continue
+            track_details[trackno - 1] = trackdata_details[trackno - 1]
+            if printer is not None:
+                printer.print_trackdata(trackdata_details)
+        if args.sink is not None:
+            args.sink.write_swipe(tuple(track_details), result.index)
+
+
+def msr100_decoder(args, source=None) -> msr100.Decoder:
+    """Returns the keyboard reader, recording the key events if requested."""
+    if source is None and args.record_keys is not None:
+        source = keylog.RecordingSource(msr100.KeyboardSource(), open(args.record_keys, "wb"))
+    return msr100.Decoder(args.remap_from_us, source=source, keymap=args.keymap)
+
+
+def process_replay(args):
+    """Decodes a key event recording like swipes of the keyboard reader."""
+    events = keylog.read_events(args.input_file.buffer)
+    rdr = msr100_decoder(args, msr100.FakeSource(events, realtime=args.replay_realtime))
+    start = time.perf_counter()
+    count = 0
+    for trackdata in rdr.read_swipes():
+        process_trackdata(args, trackdata)
+        count += 1
+    logger.info("Replayed %d swipes (%d key events) in %.3f seconds",
+                count, len(events), time.perf_counter() - start)
+
+
+async def process_serial(args):
+    """Reads swipes from the Arduino reader until interrupted, the port stays
+    open between the swipes.
+    """
+    rdr = basereader.AsyncSerialReader(
+        args.serial_port, args.serial_baudrate, timeout=args.serial_timeout,
+        protocol=args.serial_protocol)
+    try:
+        async for bitstring in rdr:
+            try:
+                process_trackdata(args, decode_bitstring(args, bitstring))
+            except Exception as e:
+                # Keep reading, the next swipe may be fine
+                print(f"Error decoding: {e}")
+    finally:
+        rdr.close()
+
+
+def process_fan_in(args):
+    """Reads from all --fan-in sources at once. The swipes are decoded and
+    printed one after the other in arrival order, tagged with their source.
+    """
+    fan_in = fanin.FanIn()
+    with contextlib.ExitStack() as files:  # The oneline files, open until the run ends
+        for spec in args.fan_in:
+            (kind, _, target) = spec.partition(":")
+            if kind == "msr100" and not target:
+                # Reads the keyboard, a second one would see the same input
+                if sum(1 for s in args.fan_in if s.partition(":")[0] == "msr100") > 1:
+                    print("Only one msr100 source is supported")
+                    sys.exit(1)
+                fan_in.add_swipes(spec, msr100_decoder(args).read_swipes(), decoded=True)
+            elif kind == "ardumsr" and target:
+                fan_in.add_serial(spec, basereader.AsyncSerialReader(
+                    target, args.serial_baudrate, timeout=args.serial_timeout,
+                    protocol=args.serial_protocol))
+            elif kind == "oneline" and target:
+                fan_in.add_swipes(spec, datareader.EachLine(files.enter_context(open(target, "rt"))).read_swipes())
+            else:
+                print(f"Unsupported fan-in source: {spec}")
+                sys.exit(1)
+
+        for swipe in fan_in:
+            print(f"Source {swipe.source}:")
+            try:
+                trackdata = swipe.trackdata
+                if swipe.bitstring is not None:
+                    trackdata = decode_bitstring(args, swipe.bitstring)
+                process_trackdata(args, trackdata)
+            except Exception as e:
+                # Keep serving the other sources
+                print(f"Error decoding swipe from {swipe.source}: {e}")
+
+
 def main():
 
     ap = argparse.ArgumentParser()
     ap.add_argument(
-        "--input", choices=["msr100", "ardumsr", "sigrok_csv", "oneline"], default="msr100")
+        "--input", choices=["msr100", "ardumsr", "sigrok_csv", "sigrok_csv_numpy", "sigrok_stream", "sigrok_sr", "f2f_csv", "oneline", "msr100_replay"], default="msr100")
     ap.add_argument("--input-file", type=argparse.FileType("rt"),
                     help="A file containg the data for reading. Use '-' for stdin.")
     ap.add_argument("--input-track", choices=[1, 2, 3], default=2,
                     help="The input track to use to decode the raw input")
-    ap.add_argument("--track1-processor", choices=[
-                    "noop", "iso7813", "bahn"], default="noop", help="processor for track 1")
-    ap.add_argument("--track2-processor", choices=[
-                    "noop", "iso7813", "bahn"], default="noop", help="processor for track 2")
-    ap.add_argument("--track3-processor", choices=[
-                    "noop", "iso4909", "girocard", "bahn"], default="noop", help="processor for track 3")
+    for trackno in (1, 2, 3):
+        ap.add_argument(f"--track{trackno}-processor", choices=registry.names(trackno),
+                        default="noop", help=f"processor for track {trackno}")
     ap.add_argument("--remap-from-us", action="store_true",
                     default=False, help="Remap scancodes from US keyboard layout")
+    ap.add_argument("--keymap", choices=["us", "de", "fr", "auto"], default=None,
+                    help="Keyboard layout the reader types in, auto detects it from the track sentinels")
+    ap.add_argument("--record-keys", metavar="FILE", default=None,
+                    help="Record the key events of the msr100 reader to FILE, for msr100_replay")
+    ap.add_argument("--replay-realtime", action="store_true", default=False,
+                    help="Replay key events with their original timing instead of full speed")
     ap.add_argument("--loop", action="store_true",
                     default=False, help="Loop reading cards")
+    ap.add_argument("--batch", action="store_true", default=False,
+                    help="Decode all swipes of the input in parallel (oneline: one bitstring per line, sigrok_stream)")
+    ap.add_argument("--jobs", type=int, default=None,
+                    help="Number of worker processes for batch mode, defaults to the number of CPUs")
+    ap.add_argument("--slip-recovery", action="store_true", default=False,
+                    help="Try to realign symbols after dropped or extra bits if a track does not decode cleanly")
+    ap.add_argument("--slip-band", type=int, default=4,
+                    help="Maximum drift in bits tried by the slip recovery")
+    ap.add_argument("--serial-port", default="/dev/ttyACM0",
+                    help="Serial port of the Arduino reader")
+    ap.add_argument("--serial-baudrate", type=int, default=9600,
+                    help="Baudrate of the Arduino reader")
+    ap.add_argument("--serial-timeout", type=float, default=5.0,
+                    help="Seconds without data after which a started swipe is dropped")
+    ap.add_argument("--serial-protocol", choices=["text", "binary"], default="text",
+                    help="Protocol the Arduino firmware is built with")
+    ap.add_argument("--fan-in", action="append", metavar="SOURCE",
+                    help="Read from several sources at once, repeat for every source: "
+                    "msr100, ardumsr:PORT or oneline:FILE")
     ap.add_argument("--print-verbose", action="store_true",
                     default=False, help="Print verbose track data")
+    ap.add_argument("--iin-index", metavar="FILE", default=None,
+                    help="IIN ranges for the verbose PAN details, a compiled index or a CSV (compiled next to it)")
+    ap.add_argument("--export", choices=list(export.SINKS), default=None,
+                    help="Also write the parsed tracks to --export-file, a row per track (arrow and parquet need pyarrow)")
+    ap.add_argument("--export-file", metavar="FILE", default=None,
+                    help="File the parsed tracks are exported to")
     ap.add_argument("--log-level", choices=list(logging.getLevelNamesMapping().keys()),
                     default=logging.INFO, help="Print verbose track data")
     args = ap.parse_args()
+    if args.export is not None and args.export_file is None:
+        ap.error("--export requires --export-file")
 
     logging.basicConfig(level=logging.getLevelName(args.log_level))
+    args.processors = get_processors(args)
+    if args.iin_index is not None:
+        iso7812.load_index(args.iin_index)
+
+    args.sink = None
+    if args.export is not None:
+        args.sink = export.open_sink(args.export, args.export_file, get_selection(args))
+    try:
+        process_input(args)
+    finally:
+        if args.sink is not None:
+            args.sink.close()
+
+
+def process_input(args):
+    """Reads and processes the input selected by the arguments."""
+    if args.fan_in:
+        process_fan_in(args)
+        return
+
+    if args.batch:
+        process_batch(args)
+        return
+
+    if args.input == "sigrok_stream":
+        # Decode while the card is in the head, the result is ready when it leaves
+        rdr = sigrok.StreamCsvReader(args.input_file)
+        stream = iso7813.StreamDecoder(args.input_track, args.slip_recovery, args.slip_band)
+        for (bits, done) in rdr.read_chunks():
+            for event in stream.feed(bits):
+                logger.debug("Stream: %s", event)
+            if not done:
+                continue
+            if stream.bitcount > 0:
+                trackdata = stream.finish()
+                print_decoded(args, trackdata)
+                process_trackdata(args, trackdata)
+            stream = iso7813.StreamDecoder(args.input_track, args.slip_recovery, args.slip_band)
+        return
+
+    if args.input == "ardumsr" and args.loop:
+        asyncio.run(process_serial(args))
+        return
+
+    if args.input == "msr100_replay":
+        process_replay(args)
+        return
+
+    if args.input == "msr100" and args.loop:
+        # Keeps the keyboard hooked, ready for the next card right away
+        print("Waiting for data ...")
+        for trackdata in msr100_decoder(args).read_swipes():
+            process_trackdata(args, trackdata)
+        return
 
     while True:
 
@@ -52,14 +294,25 @@ def main():
             elif args.input == "sigrok_csv":
                 rdr = sigrok.CsvReader(args.input_file)
                 bitstring = rdr.read_input()
+            elif args.input == "sigrok_csv_numpy":
+                rdr = sigrok.NumpyCsvReader(args.input_file)
+                bitstring = rdr.read_input()
+            elif args.input == "f2f_csv":
+                rdr = sigrok.F2fCsvReader(args.input_file)
+                bitstring = rdr.read_input()
+            elif args.input == "sigrok_sr":
+                # Session archives are binary zip files
+                rdr = sigrok.SessionReader(args.input_file.buffer)
+                bitstring = rdr.read_input()
             elif args.input == "ardumsr":
                 # The port the Arduino provides
                 rdr = basereader.SerialReader(
-                    port="/dev/ttyACM0", baudrate=9600)
+                    port=args.serial_port, baudrate=args.serial_baudrate,
+                    protocol=args.serial_protocol)
                 bitstring = rdr.read_input()
             elif args.input == "msr100":
                 # No raw reader, decode directly
-                rdr = msr100.Decoder(args.remap_from_us)
+                rdr = msr100_decoder(args)
                 trackdata = rdr.read_input()
             else:
                 print(f"Unsupported input: {args.type}")
@@ -72,52 +325,9 @@ def main():
                 sys.exit(1)
 
         if bitstring is not None:
-            dec = iso7813.Decoder(args.input_track)  # Decode as track n
-            trackdata = dec.decode_bitstring(bitstring)
-            print(f"Decoded track {args.input_track} data: '{trackdata[1]}'")
-            # TODO: decode LRC here
-
-        for (trackno, track) in enumerate(trackdata, 1):
-            processor_choice = None
-            trackdata_copy = ()
-            if trackno == 1:
-                processor_choice = args.track1_processor
-                trackdata_copy = (track, None, None)
-            elif trackno == 2:
-                processor_choice = args.track2_processor
-                trackdata_copy = (None, track, None)
-            elif trackno == 3:
-                processor_choice = args.track3_processor
-                trackdata_copy = (None, None, track)
-            else:
-                print(f"Invalid trackno: {trackno}")
-
-            parser = None
-            printer = None
-
-            if processor_choice == "noop":
-                parser = noop.Parser()
-                printer = noop.Printer()
-            elif processor_choice == "iso7813":
-                parser = iso7813.Parser()
-                printer = iso7813.Printer(print_verbose=args.print_verbose)
-            elif processor_choice == "iso4909":
-                parser = iso4909.Parser()
-                printer = iso4909.Printer(print_verbose=args.print_verbose)
-            elif processor_choice == "bahn":
-                parser = bahn.Parser()
-                printer = bahn.Printer(print_verbose=args.print_verbose)
-            elif processor_choice == "girocard":
-                parser = girocard.Parser()
-                printer = girocard.Printer(print_verbose=args.print_verbose)
-            else:
-                print(f"Unsupported processor for track {
-                      trackno}: {processor_choice}")
-                continue
+            trackdata = decode_bitstring(args, bitstring)
 
-            trackdata_details = parser.process_trackdata(trackdata_copy)
-            if printer is not None:
-                printer.print_trackdata(trackdata_details)
+        process_trackdata(args, trackdata)
 
         if not args.loop:
             break
@@ -1,41 +1,292 @@
+import asyncio
+import binascii
+import collections
 import logging
-import re
+import struct
 
 import serial
 
+from .bits import BitBuffer
+
 logger = logging.getLogger(__name__)
 
 class BaseReader:
-    def read_input(self) -> str:
+    def read_input(self) -> BitBuffer:
         raise("Not yet implemented!")
 
 
+MAX_LINE_LENGTH = 16384  # Longer lines are noise on the line
+
+
+class LineParser:
+    """Incremental parser for the line protocol of the Arduino reader. The
+    received bytes are fed as they arrive, the bitstring of a swipe is handed
+    out at its 'info: read end' marker.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._bits = None
+        self.in_swipe = False  # Between card inserted and read end
+
+    def reset(self) -> None:
+        self._buffer.clear()
+        self._bits = None
+        self.in_swipe = False
+
+    def feed(self, data: bytes) -> list:
+        """Returns the bitstrings completed by data."""
+        self._buffer += data
+        swipes = []
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(self._buffer[:end]).strip()
+            del self._buffer[:end + 1]
+            bitstring = self._parse_line(line)
+            if bitstring is not None:
+                swipes.append(bitstring)
+        if len(self._buffer) > MAX_LINE_LENGTH:
+            logger.warning("Discarding %d bytes without line end", len(self._buffer))
+            self._buffer.clear()
+        return swipes
+
+    def _parse_line(self, line: bytes) -> BitBuffer:
+        if line.startswith(b"debug:"):
+            logger.debug(line.decode("ascii", "replace"))
+        elif line.startswith(b"info: bits:"):
+            bits = line[len(b"info: bits:"):].strip()
+            if bits.strip(b"01"):
+                logger.warning("Invalid bits received: %s", bits.decode("ascii", "replace"))
+            else:
+                self._bits = BitBuffer.from_str(bits.decode("ascii"))
+        elif line == b"info: read end":
+            logger.debug("Reading finished")
+            bitstring = self._bits if self._bits is not None else BitBuffer()
+            self._bits = None
+            self.in_swipe = False
+            return bitstring
+        elif line == b"info: card inserted":
+            logger.debug("Card inserted")
+            self._bits = None
+            self.in_swipe = True
+        elif line.startswith(b"info:"):
+            logger.debug(line.decode("ascii", "replace"))
+        return None
+
+
+# Binary protocol of the firmware: MAGIC, VERSION, TYPE, LEN (u16 LE), payload,
+# CRC-16/CCITT (u16 LE) over VERSION up to the payload
+FRAME_MAGIC = 0xA5
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<BBBH")
+FRAME_CRC = struct.Struct("<H")
+FRAME_INSERT = 1  # Card inserted, no payload
+FRAME_REMOVE = 2  # Card removed, no payload
+FRAME_BITS = 3  # Bit count (u16 LE), bits packed MSB first
+FRAME_DEBUG = 4  # ASCII text
+MAX_FRAME_PAYLOAD = 1024
+
+
+def frame_crc(data: bytes) -> int:
+    return binascii.crc_hqx(data, 0xffff)
+
+
+def encode_frame(frame_type: int, payload: bytes = b"") -> bytes:
+    """Builds a frame like the firmware sends it."""
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, frame_type, len(payload))
+    return header + payload + FRAME_CRC.pack(frame_crc(header[1:] + payload))
+
+
+def encode_bits(bitstring: BitBuffer) -> bytes:
+    return encode_frame(FRAME_BITS, struct.pack("<H", len(bitstring)) + bytes(bitstring))
+
+
+class FrameParser:
+    """Incremental parser for the binary protocol of the Arduino reader, the
+    counterpart of LineParser. Damaged frames are skipped by searching the
+    next magic byte.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self.in_swipe = False  # Between card inserted and the bits
+
+    def reset(self) -> None:
+        self._buffer.clear()
+        self.in_swipe = False
+
+    def feed(self, data: bytes) -> list:
+        """Returns the bitstrings completed by data."""
+        self._buffer += data
+        swipes = []
+        while True:
+            start = self._buffer.find(FRAME_MAGIC)
+            if start < 0:
+                self._buffer.clear()
+                break
+            del self._buffer[:start]
+            if len(self._buffer) < FRAME_HEADER.size:
+                break
+            (_, version, frame_type, length) = FRAME_HEADER.unpack_from(self._buffer)
+            if version != FRAME_VERSION or length > MAX_FRAME_PAYLOAD:
+                logger.warning("Invalid frame header, version %d, length %d", version, length)
+                del self._buffer[:1]
+                continue
+            end = FRAME_HEADER.size + length
+            if len(self._buffer) < end + FRAME_CRC.size:
+                break
+            (crc,) = FRAME_CRC.unpack_from(self._buffer, end)
+            if crc != frame_crc(self._buffer[1:end]):
+                logger.warning("Frame CRC mismatch, skipping")
+                del self._buffer[:1]
+                continue
+            payload = bytes(self._buffer[FRAME_HEADER.size:end])
+            del self._buffer[:end + FRAME_CRC.size]
+            bitstring = self._parse_frame(frame_type, payload)
+            if bitstring is not None:
+                swipes.append(bitstring)
+        return swipes
+
+    def _parse_frame(self, frame_type: int, payload: bytes) -> BitBuffer:
+        if frame_type == FRAME_DEBUG:
+            logger.debug("debug: %s", payload.decode("ascii", "replace"))
+        elif frame_type == FRAME_INSERT:
+            logger.debug("Card inserted")
+            self.in_swipe = True
+        elif frame_type == FRAME_REMOVE:
+            logger.debug("Card removed")
+        elif frame_type == FRAME_BITS:
+            self.in_swipe = False
+            if len(payload) < 2:
+                logger.warning("Bits frame without bit count")
+                return None
+            (bitcount,) = struct.unpack_from("<H", payload)
+            if (bitcount + 7) // 8 != len(payload) - 2:
+                logger.warning("Bit count %d does not match %d bytes", bitcount, len(payload) - 2)
+                return None
+            logger.debug("Reading finished, %d bits", bitcount)
+            return BitBuffer.from_bytes(payload[2:], bitcount)
+        else:
+            logger.warning("Unknown frame type %d", frame_type)
+        return None
+
+
+PROTOCOLS = {"text": LineParser, "binary": FrameParser}
+
+
 class SerialReader(BaseReader):
-    def __init__(self, port: str, baudrate: int, bytesize: int=8, parity: str=serial.PARITY_NONE, stopbits: int=1, timeout: int=None) -> None:
+    def __init__(self, port: str, baudrate: int, bytesize: int=8, parity: str=serial.PARITY_NONE, stopbits: int=1, timeout: int=None, protocol: str="text") -> None:
         self._port = port
         self._baudrate = baudrate
         self._bytesize = bytesize
         self._parity = parity
         self._stopbits = stopbits
         self._timeout = timeout
-        pass
+        self._protocol = protocol
 
-    def read_input(self) -> str:
-        bitstring = ""
-        read_end = False
-        card_inserted = False
-        with serial.Serial(self._port, baudrate=self._baudrate, bytesize=self._bitcount, parity=self._parity, stopbits=self._stopbit, timeout = self._timeout) as mc_port:
+    def read_input(self) -> BitBuffer:
+        parser = PROTOCOLS[self._protocol]()
+        with serial.Serial(self._port, baudrate=self._baudrate, bytesize=self._bytesize, parity=self._parity, stopbits=self._stopbits, timeout = self._timeout) as mc_port:
             logger.debug("Waiting for card ...")
-            while not read_end:
-                line = mc_port.readline().decode('ascii')
-                if line.startswith("debug"):
-                    logger.debug(line.strip())
-                if "info: read end" in line:
-                    logger.debug("Reading finished")
-                    # We're done
-                    read_end = True
-                matcher = re.match(r"info:\sbits:\s+([01]+)", line)
-                if matcher:
-                    bitstring = matcher.group(1)
-            logger.debug("Bitstring read: %d", bitstring)
+            while True:
+                data = mc_port.read(mc_port.in_waiting or 1)
+                if not data:  # Timeout
+                    logger.warning("Timeout waiting for card")
+                    return BitBuffer()
+                swipes = parser.feed(data)
+                if swipes:
+                    break
+        bitstring = swipes[0]
+        logger.debug("Bitstring read: %s", bitstring)
         return bitstring
+
+
+class AsyncSerialReader(BaseReader):
+    """Reads swipes from the Arduino reader with asyncio. The port stays open
+    across swipes, since opening it resets most Arduinos. The bitstrings are
+    handed out by the async iterator:
+
+        async for bitstring in AsyncSerialReader("/dev/ttyACM0", 9600):
+            ...
+
+    A swipe without data for timeout seconds is dropped. On errors the port is
+    closed and opened again after reconnect_delay seconds. The protocol is
+    "text" or "binary", like the firmware is built. Needs an event loop with
+    add_reader() support (POSIX).
+    """
+
+    def __init__(self, port: str, baudrate: int, timeout: float = None,
+                 reconnect_delay: float = 1.0, protocol: str = "text", **serial_kwargs) -> None:
+        self._port_name = port
+        self._baudrate = baudrate
+        self._timeout = timeout
+        self._reconnect_delay = reconnect_delay
+        self._serial_kwargs = serial_kwargs
+        self._port = None
+        self._parser = PROTOCOLS[protocol]()
+        self._pending = collections.deque()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> BitBuffer:
+        while not self._pending:
+            if self._port is None:
+                await self.__connect()
+            try:
+                data = await self.__read()
+            except (serial.SerialException, OSError) as e:
+                logger.warning("Error reading %s: %s", self._port_name, e)
+                self.close()
+                await asyncio.sleep(self._reconnect_delay)
+                continue
+            if data is None:
+                logger.warning("Timeout reading swipe, dropped")
+                self._parser.reset()
+                continue
+            self._pending.extend(self._parser.feed(data))
+        bitstring = self._pending.popleft()
+        logger.debug("Bitstring read: %s", bitstring)
+        return bitstring
+
+    async def __connect(self) -> None:
+        while self._port is None:
+            try:
+                # Non-blocking, reads only after the event loop reported data
+                self._port = serial.Serial(self._port_name, baudrate=self._baudrate,
+                                           timeout=0, **self._serial_kwargs)
+                logger.debug("Opened %s, waiting for card ...", self._port_name)
+            except (serial.SerialException, OSError) as e:
+                logger.warning("Can't open %s: %s", self._port_name, e)
+                await asyncio.sleep(self._reconnect_delay)
+        self._parser.reset()
+
+    async def __read(self) -> bytes:
+        """Waits for data, returns None if a started swipe timed out."""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = self._port.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await asyncio.wait_for(readable, self._timeout if self._parser.in_swipe else None)
+        except TimeoutError:
+            return None
+        finally:
+            loop.remove_reader(fd)
+        return self._port.read(self._port.in_waiting or 1)
+
+    def close(self) -> None:
+        if self._port is not None:
+            self._port.close()
+            self._port = None
+
+    def read_input(self) -> BitBuffer:
+        # A single swipe, the port is closed afterwards
+        async def read_one():
+            try:
+                return await anext(self)
+            finally:
+                self.close()
+        return asyncio.run(read_one())
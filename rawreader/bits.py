@@ -0,0 +1,193 @@
+import itertools
+
+# Per byte value: the byte with its bits in reversed order, and its bits
+REVERSED_BYTES = bytes(int(format(byte, "08b")[::-1], 2) for byte in range(256))
+BYTE_BITS = tuple(tuple((byte >> shift) & 1 for shift in range(7, -1, -1)) for byte in range(256))
+
+
+class BitBuffer:
+    """Packed sequence of bits, 8 bits per byte. The first bit is stored in the
+    most significant bit of the first byte, so the value of a buffer is the
+    bitstring read as binary number.
+
+    Slices are read-only views sharing the storage of their buffer. Strings of
+    '0'/'1' convert with from_str() and str(), buffers compare equal to their
+    bitstring.
+    """
+
+    __slots__ = ("_data", "_length", "_offset", "_readonly")
+
+    def __init__(self, data: bytearray = None, length: int = 0, offset: int = 0, readonly: bool = False) -> None:
+        self._data = bytearray() if data is None else data
+        self._length = length
+        self._offset = offset  # First bit of the buffer in data
+        self._readonly = readonly
+
+    @classmethod
+    def from_str(cls, bitstring: str) -> "BitBuffer":
+        length = len(bitstring)
+        if length == 0:
+            return cls()
+        if bitstring.strip("01"):  # int() would also take signs, prefixes, '_' and spaces
+            raise ValueError(f"Not a bitstring: {bitstring!r}")
+        return cls.from_int(int(bitstring, 2), length)
+
+    @classmethod
+    def from_int(cls, value: int, length: int) -> "BitBuffer":
+        padded = value << (-length % 8)  # Fill up the last byte
+        return cls(bytearray(padded.to_bytes((length + 7) // 8, "big")), length)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, length: int = None) -> "BitBuffer":
+        if length is None:
+            length = len(data) * 8
+        buf = cls(bytearray(data[:(length + 7) // 8]), length)
+        if length % 8 != 0:
+            buf._data[-1] &= (0xff << (-length % 8)) & 0xff  # Clear the padding
+        return buf
+
+    def append(self, bit: int):
+        if self._readonly:
+            raise ValueError("Bit buffer view is read-only")
+        if self._length % 8 == 0:
+            self._data.append(0)
+        if bit:
+            self._data[-1] |= 0x80 >> (self._length % 8)
+        self._length += 1
+
+    def extend(self, bits):
+        """Appends a bit buffer, a bitstring or an iterable of bits. Buffers
+        and bitstrings are appended packed, a byte at a time.
+        """
+        if self._readonly:
+            raise ValueError("Bit buffer view is read-only")
+        if isinstance(bits, str):
+            bits = BitBuffer.from_str(bits)
+        if not isinstance(bits, BitBuffer):
+            for bit in bits:
+                self.append(bit == "1" if isinstance(bit, str) else bit)
+            return
+        (value, length) = (bits.to_int(), len(bits))
+        free = -self._length % 8  # Unused bits of the last byte
+        if free > 0 and length > 0:
+            taken = min(free, length)
+            length -= taken
+            self._data[-1] |= (value >> length) << (free - taken)
+            value &= (1 << length) - 1
+            self._length += taken
+        if length > 0:
+            self._data += (value << (-length % 8)).to_bytes((length + 7) // 8, "big")
+            self._length += length
+
+    def to_int(self) -> int:
+        if self._length == 0:
+            return 0
+        first = self._offset // 8
+        end = self._offset + self._length
+        last = (end + 7) // 8
+        value = int.from_bytes(self._data[first:last], "big")
+        return (value >> (last * 8 - end)) & ((1 << self._length) - 1)
+
+    def to_str(self) -> str:
+        if self._length == 0:
+            return ""
+        return format(self.to_int(), f"0{self._length}b")
+
+    def __bytes__(self) -> bytes:
+        return bytes(BitBuffer.from_int(self.to_int(), self._length)._data)
+
+    def count(self, bit="1") -> int:
+        """Counts the set bits (popcount) or the cleared bits."""
+        ones = self.to_int().bit_count()
+        return ones if bit in ("1", 1, True) else self._length - ones
+
+    def __matches(self, pattern, start: int) -> int:
+        """Returns the positions of the pattern at or after start as the bits
+        of an int, position 0 in the most significant of len(self) bits.
+        Every pattern bit is compared at all positions at once, by shifting
+        the value by the bit's offset in the pattern.
+        """
+        if isinstance(pattern, str):
+            pattern = BitBuffer.from_str(pattern)
+        (length, size) = (self._length, len(pattern))
+        if size == 0 or size > length - start:
+            return 0
+        value = self.to_int()
+        pattern_value = pattern.to_int()
+        mask = (1 << length) - 1
+        matches = mask >> start  # Positions before start dropped
+        matches &= ~((1 << (size - 1)) - 1)  # No room for the pattern after these
+        for i in range(size):
+            shifted = (value << i) & mask
+            matches &= shifted if (pattern_value >> (size - 1 - i)) & 1 else ~shifted
+            if matches == 0:
+                break
+        return matches
+
+    def find(self, pattern, start: int = 0) -> int:
+        """Returns the position of the first occurence of the pattern (bitstring
+        or bit buffer) at or after start, -1 if not found.
+        """
+        if start > 0:
+            # Only the bits from start are taken from the storage
+            pos = self[start:].find(pattern)
+            return pos if pos < 0 else pos + start
+        matches = self.__matches(pattern, 0)
+        return self._length - matches.bit_length() if matches else -1
+
+    def find_all(self, pattern, start: int = 0):
+        """Yields the positions of all (overlapping) occurences of the pattern
+        at or after start.
+        """
+        matches = self.__matches(pattern, start)
+        while matches:
+            top = matches.bit_length() - 1
+            yield self._length - 1 - top
+            matches ^= 1 << top
+
+    def reversed(self) -> "BitBuffer":
+        """Returns a copy with the bits in reversed order."""
+        # Reversing the bytes and the bits in each byte moves the padding to the front
+        data = bytes(self).translate(REVERSED_BYTES)[::-1]
+        return BitBuffer.from_int(int.from_bytes(data, "big"), self._length)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            (start, stop, step) = key.indices(self._length)
+            if step == -1:
+                return self[stop + 1:start + 1].reversed()
+            if step != 1:
+                result = BitBuffer()
+                result.extend(self[i] for i in range(start, stop, step))
+                return result
+            return BitBuffer(self._data, max(0, stop - start), self._offset + start, readonly=True)
+        if key < 0:
+            key += self._length
+        if key < 0 or key >= self._length:
+            raise IndexError("Bit index out of range")
+        pos = self._offset + key
+        return (self._data[pos // 8] >> (7 - pos % 8)) & 1
+
+    def __iter__(self):
+        bits = itertools.chain.from_iterable(BYTE_BITS[byte] for byte in bytes(self))
+        return itertools.islice(bits, self._length)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BitBuffer):
+            return self._length == other._length and self.to_int() == other.to_int()
+        if isinstance(other, str):
+            if len(other) != self._length or other.strip("01"):
+                return False
+            return self._length == 0 or int(other, 2) == self.to_int()
+        return NotImplemented
+
+    __hash__ = None  # Mutable
+
+    def __str__(self) -> str:
+        return self.to_str()
+
+    def __repr__(self) -> str:
+        return f"BitBuffer('{self.to_str()}')"
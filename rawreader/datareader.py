@@ -1,6 +1,10 @@
 import csv
+import logging
 
 from . import basereader
+from .bits import BitBuffer
+
+logger = logging.getLogger(__name__)
 
 
 class FirstLine(basereader.BaseReader):
@@ -10,15 +14,38 @@ class FirstLine(basereader.BaseReader):
         print()
         self._fh = fh
 
-    def read_input(self) -> tuple:
-        return self._fh.readline().strip()
+    def read_input(self) -> BitBuffer:
+        return BitBuffer.from_str(self._fh.readline().strip())
+
+
+class EachLine(basereader.BaseReader):
+    """Reads one bitstring per line, e.g. from an archive of swipes."""
+
+    def __init__(self, fh) -> None:
+        super().__init__()
+        self._fh = fh
+
+    def read_swipes(self):
+        for (lineno, line) in enumerate(self._fh, 1):
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                yield BitBuffer.from_str(line)
+            except ValueError:
+                logger.warning("Skipping line %d, not a bitstring", lineno)
+
+    def read_input(self) -> BitBuffer:
+        for bitstring in self.read_swipes():
+            return bitstring
+        return BitBuffer()
 
 
-def read_sigrok_csv(fh) -> str:
+def read_sigrok_csv(fh) -> BitBuffer:
     reader = csv.DictReader(fh)
     lineno = 0
     lastline = None
-    bitstring = ""
+    bitstring = BitBuffer()
     for line in reader:
         lineno += 1
         if lastline is None:
@@ -29,10 +56,7 @@ def read_sigrok_csv(fh) -> str:
             continue
 
         if (lastline["RCP"] == "1" and line["RCP"] == "0"):  # Negative clock edge
-            if (line["RDP"] == "1"):  # Negative logic
-                bitstring += "0"
-            else:
-                bitstring += "1"
+            bitstring.append(line["RDP"] != "1")  # Negative logic
 
         lastline = line
 
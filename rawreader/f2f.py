@@ -0,0 +1,65 @@
+import logging
+
+from .bits import BitBuffer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# An interval shorter than SHORT_RATIO bit periods is half a cell (a '1'),
+# one longer than GAP_RATIO bit periods is a gap (no card / idle line).
+SHORT_RATIO = 0.75
+GAP_RATIO = 2.5
+
+
+def transitions(levels):
+    """Returns the sample indices where the level of a data line changes."""
+    levels = np.asarray(levels)
+    return np.flatnonzero(levels[1:] != levels[:-1]) + 1
+
+
+def decode_transitions(times, period: float = None, smoothing: float = 0.25, preamble: int = 16) -> BitBuffer:
+    """Recovers the bits of a F2F (Aiken biphase) encoded data line from the
+    times of its transitions and returns them as bit buffer for the
+    iso7813.Decoder.
+
+    Every bit cell starts with a transition, a '1' has an additional one in the
+    middle of the cell. The bit period is tracked per cell with an exponential
+    moving average to follow the acceleration during the swipe. The initial
+    period is the median of the first intervals (the leading zeros of a track)
+    unless given. Works on the transitions only, the sample count does not
+    matter. Requires numpy.
+    """
+    intervals = np.diff(np.asarray(times, dtype=np.float64))
+    if len(intervals) == 0:
+        return BitBuffer()
+    if period is None:
+        period = float(np.median(intervals[:preamble]))
+    logger.debug("Initial bit period: %f", period)
+
+    bits = BitBuffer()
+    half = None  # First half of a '1' cell
+    for interval in intervals.tolist():
+        if interval > GAP_RATIO * period:  # Idle line, wait for the next cell
+            half = None
+            continue
+        if interval < SHORT_RATIO * period:
+            if half is None:
+                half = interval
+                continue
+            cell = half + interval
+            bits.append(1)
+            half = None
+        else:
+            if half is not None:
+                logger.debug("Dangling half cell at bit %d", len(bits))
+                half = None
+            cell = interval
+            bits.append(0)
+        period += smoothing * (cell - period)
+
+    logger.debug("%d transitions, %d bits", len(intervals) + 1, len(bits))
+    return bits
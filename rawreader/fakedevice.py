@@ -0,0 +1,86 @@
+import argparse
+import logging
+import os
+import pty
+import sys
+import time
+import tty
+
+from . import basereader
+from .bits import BitBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class FakeDevice:
+    """Stand-in for the Arduino reader on a pseudo terminal. The readers open
+    the port name like a serial port, swipes are sent in the text or binary
+    protocol of the firmware. POSIX only.
+    """
+
+    def __init__(self, protocol: str = "text") -> None:
+        if protocol not in basereader.PROTOCOLS:
+            raise ValueError(f"Unknown protocol: {protocol}")
+        self._protocol = protocol
+        (self._master, self._slave) = pty.openpty()
+        tty.setraw(self._master)  # No echo or line end translation
+        self.port = os.ttyname(self._slave)
+
+    def __enter__(self) -> "FakeDevice":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the device, open readers get an error."""
+        if self._master is not None:
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = self._slave = None
+
+    def write(self, data: bytes) -> None:
+        os.write(self._master, data)
+
+    def encode_swipe(self, bitstring: BitBuffer) -> bytes:
+        """Returns the bytes the firmware sends for a swipe."""
+        if self._protocol == "binary":
+            return (basereader.encode_frame(basereader.FRAME_INSERT)
+                    + basereader.encode_frame(basereader.FRAME_DEBUG, b"clockinit")
+                    + basereader.encode_frame(basereader.FRAME_REMOVE)
+                    + basereader.encode_bits(bitstring))
+        return (b"info: card inserted\r\n"
+                b"debug: clockinit\r\n"
+                b"info: card removed\r\n"
+                + f"info: bits: {bitstring}\r\n".encode("ascii")
+                + f"debug: bitcount: {len(bitstring)}\r\n".encode("ascii")
+                + b"info: read end\r\n")
+
+    def send_swipe(self, bitstring) -> None:
+        if isinstance(bitstring, str):
+            bitstring = BitBuffer.from_str(bitstring)
+        self.write(self.encode_swipe(bitstring))
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Fake Arduino reader, sends the bitstrings of a file (one per line) as swipes")
+    ap.add_argument("input_file", type=argparse.FileType("rt"))
+    ap.add_argument("--protocol", choices=list(basereader.PROTOCOLS), default="text")
+    ap.add_argument("--delay", type=float, default=1.0,
+                    help="Seconds before each swipe")
+    args = ap.parse_args()
+
+    with FakeDevice(args.protocol) as device:
+        print(f"Fake device on {device.port}", flush=True)
+        for line in args.input_file:
+            line = line.strip()
+            if not line:
+                continue
+            time.sleep(args.delay)
+            device.send_swipe(line)
+        time.sleep(args.delay)  # Let the reader drain the port
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import queue
+import threading
+from typing import NamedTuple
+
+from .bits import BitBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class Swipe(NamedTuple):
+    source: str  # Name of the source, e.g. its spec on the command line
+    bitstring: BitBuffer  # Raw bits, None if the source decodes itself
+    trackdata: tuple  # Decoded tracks of a decoding source, else None
+
+
+class FanIn:
+    """Collects the swipes of several readers in a single queue, tagged by
+    their source. Iterables of swipes (e.g. the keyboard reader) are consumed
+    in a thread each, the asyncio serial readers share one event loop thread.
+    Iterating hands out the swipes in arrival order until all sources ended.
+    """
+
+    def __init__(self) -> None:
+        self._queue = queue.Queue()
+        self._threads = []
+        self._serial = []  # (source, AsyncSerialReader)
+
+    def add_swipes(self, source: str, swipes, decoded: bool = False) -> None:
+        """Adds an iterable of bitstrings, or of track data if decoded is set.
+        The source ends with it.
+        """
+        self._threads.append(threading.Thread(
+            target=self.__run_swipes, args=(source, swipes, decoded), daemon=True))
+
+    def add_serial(self, source: str, reader) -> None:
+        self._serial.append((source, reader))
+
+    def __run_swipes(self, source: str, swipes, decoded: bool) -> None:
+        try:
+            for data in swipes:
+                self._queue.put(Swipe(source, None, data) if decoded else Swipe(source, data, None))
+        except Exception as e:
+            logger.error("Error reading %s: %s", source, e)
+        finally:
+            self._queue.put(None)  # Source ended
+
+    async def __read_serial(self, source: str, reader) -> None:
+        try:
+            async for bitstring in reader:
+                self._queue.put(Swipe(source, bitstring, None))
+        finally:
+            reader.close()
+
+    def __run_serial(self) -> None:
+        async def read_all():
+            await asyncio.gather(*(self.__read_serial(source, reader) for (source, reader) in self._serial))
+        try:
+            asyncio.run(read_all())
+        finally:
+            self._queue.put(None)
+
+    def __iter__(self):
+        if self._serial:
+            self._threads.append(threading.Thread(target=self.__run_serial, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        running = len(self._threads)
+        while running > 0:
+            swipe = self._queue.get()
+            if swipe is None:
+                running -= 1
+                continue
+            yield swipe
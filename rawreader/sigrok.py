@@ -1,20 +1,32 @@
+import configparser
 import csv
 import logging
-from . import basereader
+import mmap
+import struct
+import zipfile
+from . import basereader, f2f
+from .bits import BitBuffer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 logger = logging.getLogger(__name__)
 
+CHANNELS = ("CRD", "RCP", "RDP")  # Card present, clock, data (all negative logic)
+
 class CsvReader(basereader.BaseReader):
 
     def __init__(self, fh) -> None:
         super().__init__()
         self._fh = fh
 
-    def read_input(self) -> tuple:
+    def read_input(self) -> BitBuffer:
         rdr = csv.DictReader(self._fh)
         lineno = 0
         lastline = None
-        bitstring = ""
+        bitstring = BitBuffer()
         for line in rdr:
             lineno += 1
             if lastline is None:
@@ -25,13 +37,243 @@ class CsvReader(basereader.BaseReader):
                 continue
 
             if (lastline["RCP"] == "1" and line["RCP"] == "0"): # Negative clock edge
-                if (line["RDP"] == "1"): # Negative logic
-                    bitstring += "0"
-                else:
-                    bitstring += "1"
+                bitstring.append(line["RDP"] != "1") # Negative logic
 
             lastline = line
 
         logger.debug("Read %d lines", lineno)
         logger.debug("Bits read: '%s'", bitstring)
         return bitstring
+
+
+def _load_columns(fh, names: tuple) -> tuple:
+    """Loads the named columns of a sigrok csv export into uint8 arrays,
+    one per name. All other columns are skipped by the parser.
+    """
+    line = fh.readline()
+    while line.startswith(";"):  # sigrok-cli comments
+        line = fh.readline()
+    header = [name.strip() for name in next(csv.reader([line]))]
+    usecols = [header.index(name) for name in names]
+    data = np.loadtxt(fh, delimiter=",", usecols=usecols,
+                      dtype=np.uint8, ndmin=2)
+    return tuple(data[:, i] for i in range(len(names)))
+
+
+def _latch_bits(crd, rcp, rdp):
+    """Returns the data bits latched on the negative clock edges as an uint8
+    array of 0/1 values.
+
+    Like CsvReader, sampling ends at the first sample that reports no card
+    (CRD high): that sample still completes a clock edge, everything after it
+    is ignored.
+    """
+    card_out = np.flatnonzero(crd == 1)
+    end = card_out[0] if len(card_out) > 0 else len(crd) - 1
+    edges = (rcp[:end] == 1) & (rcp[1:end + 1] == 0)  # Negative clock edge
+    return (rdp[1:end + 1][edges] != 1).view(np.uint8)  # Negative logic
+
+
+def _to_bitbuffer(bits) -> BitBuffer:
+    return BitBuffer.from_bytes(np.packbits(bits).tobytes(), len(bits))
+
+
+class NumpyCsvReader(basereader.BaseReader):
+    """Reads the same sigrok csv export as CsvReader, but loads only the
+    CRD/RCP/RDP columns into integer arrays and finds the clock edges in one
+    vectorized pass. Requires numpy.
+    """
+
+    def __init__(self, fh) -> None:
+        super().__init__()
+        if np is None:
+            raise ImportError("NumpyCsvReader requires numpy")
+        self._fh = fh
+
+    def read_input(self) -> BitBuffer:
+        (crd, rcp, rdp) = _load_columns(self._fh, CHANNELS)
+        if len(crd) == 0:
+            return BitBuffer()
+        bitstring = _to_bitbuffer(_latch_bits(crd, rcp, rdp))
+        logger.debug("Read %d lines", len(crd))
+        logger.debug("Bits read: '%s'", bitstring)
+        return bitstring
+
+
+class F2fCsvReader(basereader.BaseReader):
+    """Reads a sigrok csv export of the F2F encoded data line only, without
+    card and clock lines. The bits are recovered from the transitions of the
+    data line by the self-clocking f2f decoder. Requires numpy.
+    """
+
+    def __init__(self, fh, channel: str = "RDP") -> None:
+        super().__init__()
+        if np is None:
+            raise ImportError("F2fCsvReader requires numpy")
+        self._fh = fh
+        self._channel = channel
+
+    def read_input(self) -> BitBuffer:
+        (data,) = _load_columns(self._fh, (self._channel,))
+        bitstring = f2f.decode_transitions(f2f.transitions(data))
+        logger.debug("Read %d lines", len(data))
+        logger.debug("Bits read: '%s'", bitstring)
+        return bitstring
+
+
+class StreamCsvReader(CsvReader):
+    """Reads a sigrok csv stream (e.g. sigrok-cli piped to stdin) in bounded
+    chunks of lines. The CRD line is watched for card insert/remove and the
+    bitstring of every swipe is handed out as soon as the card leaves the
+    head, so memory only depends on the length of a single swipe.
+    """
+
+    def __init__(self, fh, chunk_size: int = 65536) -> None:
+        super().__init__(fh)
+        self._chunk_size = chunk_size  # Size hint (bytes) of a chunk of lines
+
+    def _read_header(self) -> list:
+        line = self._fh.readline()
+        while line.startswith(";"):  # sigrok-cli comments
+            line = self._fh.readline()
+        return [name.strip() for name in next(csv.reader([line]))]
+
+    def read_chunks(self):
+        """Yields (bits, done) while the stream is read: the bits of the
+        current swipe read since the last yield, done when the card left the
+        head. Lets a StreamDecoder work while the card is still in the head.
+        """
+        header = self._read_header()
+        (crd_col, rcp_col, rdp_col) = [header.index(name) for name in CHANNELS]
+        lineno = 0
+        last_crd = "1"
+        last_rcp = None
+        bits = BitBuffer()
+        while True:
+            lines = self._fh.readlines(self._chunk_size)
+            if not lines:
+                break
+            for line in csv.reader(lines):
+                lineno += 1
+                crd = line[crd_col]
+                rcp = line[rcp_col]
+                if last_crd == "1" and crd == "0":  # Card inserted, negative logic
+                    logger.debug("Card inserted at line %d", lineno)
+                    bits = BitBuffer()
+                elif last_crd == "0":
+                    if last_rcp == "1" and rcp == "0":  # Negative clock edge
+                        bits.append(line[rdp_col] != "1")  # Negative logic
+                    if crd == "1":  # Card removed
+                        logger.debug("Card removed at line %d", lineno)
+                        yield (bits, True)
+                        bits = BitBuffer()
+                last_crd = crd
+                last_rcp = rcp
+            if last_crd == "0" and len(bits) > 0:  # Card still in the head
+                yield (bits, False)
+                bits = BitBuffer()
+
+        if last_crd == "0":  # Stream ended while reading a card
+            yield (bits, True)
+        logger.debug("Read %d lines", lineno)
+
+    def read_swipes(self):
+        swipe = BitBuffer()
+        for (bits, done) in self.read_chunks():
+            swipe.extend(bits)
+            if done:
+                logger.debug("%d bits read", len(swipe))
+                if len(swipe) > 0:
+                    yield swipe
+                swipe = BitBuffer()
+
+    def read_input(self) -> BitBuffer:
+        # The first swipe only
+        for bitstring in self.read_swipes():
+            return bitstring
+        return BitBuffer()
+
+
+class SessionReader(basereader.BaseReader):
+    """Reads a native sigrok session archive (.sr). The CRD/RCP/RDP channels
+    are looked up by name in the session metadata and unpacked directly from
+    the packed logic chunks. Chunks stored without compression are memory
+    mapped, compressed ones are inflated one at a time. Requires numpy.
+
+    The file handle has to be opened in binary mode and be seekable.
+    """
+
+    LOCAL_HEADER = struct.Struct("<4s5H3L2H")  # zip local file header
+
+    def __init__(self, fh) -> None:
+        super().__init__()
+        if np is None:
+            raise ImportError("SessionReader requires numpy")
+        self._fh = fh
+
+    def _read_metadata(self, zf: zipfile.ZipFile) -> tuple:
+        metadata = configparser.ConfigParser(interpolation=None)
+        metadata.read_string(zf.read("metadata").decode("utf-8"))
+        device = metadata["device 1"]
+        probes = {}
+        for (key, value) in device.items():
+            if key.startswith("probe") and key[5:].isdigit():
+                probes[value] = int(key[5:]) - 1  # Bit index in a sample
+        for name in CHANNELS:
+            if name not in probes:
+                raise ValueError(f"Channel {name} not found in session metadata")
+        return (device["capturefile"], int(device.get("unitsize", "1")), probes)
+
+    def _chunk_names(self, zf: zipfile.ZipFile, capturefile: str) -> list:
+        names = zf.namelist()
+        if capturefile in names:  # Single chunk, older sessions
+            return [capturefile]
+        chunks = [name for name in names if name.startswith(f"{capturefile}-")
+                  and name[len(capturefile) + 1:].isdigit()]
+        return sorted(chunks, key=lambda name: int(name[len(capturefile) + 1:]))
+
+    def _chunk_data(self, zf: zipfile.ZipFile, mm: mmap.mmap, name: str):
+        info = zf.getinfo(name)
+        if mm is None or info.compress_type != zipfile.ZIP_STORED:
+            return np.frombuffer(zf.read(info), dtype=np.uint8)
+        header = self.LOCAL_HEADER.unpack_from(mm, info.header_offset)
+        offset = info.header_offset + self.LOCAL_HEADER.size + header[-2] + header[-1]
+        return np.frombuffer(mm, dtype=np.uint8, count=info.file_size, offset=offset)
+
+    def read_input(self) -> BitBuffer:
+        mm = None
+        try:
+            mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            logger.debug("Session file can't be memory mapped, reading chunks")
+
+        bits = []
+        samplecount = 0
+        with zipfile.ZipFile(self._fh) as zf:
+            (capturefile, unitsize, probes) = self._read_metadata(zf)
+            last = None  # Last sample of the previous chunk
+            for name in self._chunk_names(zf, capturefile):
+                data = self._chunk_data(zf, mm, name)
+                samples = data[:len(data) - len(data) % unitsize].reshape(-1, unitsize)
+                channels = []
+                for channel in CHANNELS:
+                    probe = probes[channel]
+                    channels.append((samples[:, probe // 8] >> (probe % 8)) & 1)
+                del data, samples  # Release the mapped chunk
+                samplecount += len(channels[0])
+                if last is not None:
+                    channels = [np.concatenate((l, c)) for (l, c) in zip(last, channels)]
+                if len(channels[0]) == 0:
+                    continue
+                bits.append(_latch_bits(*channels))
+                if (channels[0] == 1).any():  # Card is out, sampling ends
+                    break
+                last = [c[-1:] for c in channels]
+
+        if mm is not None:
+            mm.close()
+
+        bitstring = _to_bitbuffer(np.concatenate(bits)) if len(bits) > 0 else BitBuffer()
+        logger.debug("Read %d samples", samplecount)
+        logger.debug("Bits read: '%s'", bitstring)
+        return bitstring
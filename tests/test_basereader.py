@@ -0,0 +1,133 @@
+import asyncio
+import os
+import threading
+import time
+
+from rawreader import basereader
+from rawreader.bits import BitBuffer
+from rawreader.fakedevice import FakeDevice
+
+from tracks import TRACK2, encode
+
+BITS = encode(TRACK2)
+DEADLINE = 5.0  # Seconds a test may wait for swipes
+
+
+def play(device: FakeDevice, steps: list) -> threading.Thread:
+    """Runs the steps from a thread, each a delay and the bytes to write
+    then or a callable to call then. The bytes are written in small chunks,
+    like they arrive from a serial line.
+    """
+    def run():
+        for (delay, step) in steps:
+            time.sleep(delay)
+            if callable(step):
+                step()
+                continue
+            for i in range(0, len(step), 16):
+                device.write(step[i:i + 16])
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def read_swipes(reader: basereader.AsyncSerialReader, count: int) -> list:
+    async def read():
+        swipes = []
+        try:
+            async for bitstring in reader:
+                swipes.append(str(bitstring))
+                if len(swipes) == count:
+                    break
+        finally:
+            reader.close()
+        return swipes
+    return asyncio.run(asyncio.wait_for(read(), DEADLINE))
+
+
+def test_swipes_with_log_lines():
+    with FakeDevice() as device:
+        swipe = device.encode_swipe(BITS)
+        play(device, [(0.1, swipe), (0.05, b"info: unknown line\r\ndebug: idle\r\n"), (0.05, swipe)])
+        assert read_swipes(basereader.AsyncSerialReader(device.port, 9600), 2) == [BITS, BITS]
+
+
+def test_stalled_swipe_is_dropped(caplog):
+    with FakeDevice() as device:
+        stalled = b"info: card inserted\r\ninfo: bits: 0101"  # The rest never arrives
+        play(device, [(0.1, stalled), (0.5, device.encode_swipe(BITS))])
+        start = time.monotonic()
+        swipes = read_swipes(basereader.AsyncSerialReader(device.port, 9600, timeout=0.2), 1)
+        assert swipes == [BITS]
+        assert time.monotonic() - start >= 0.5
+        assert "Timeout reading swipe, dropped" in caplog.messages
+
+
+def test_no_timeout_between_swipes():
+    with FakeDevice() as device:
+        play(device, [(0.4, device.encode_swipe(BITS))])  # Longer than the timeout, but no swipe started
+        assert read_swipes(basereader.AsyncSerialReader(device.port, 9600, timeout=0.1), 1) == [BITS]
+
+
+def test_reconnect(tmp_path, caplog):
+    link = tmp_path / "ttyACM0"
+
+    def connect(device):
+        def step():
+            new = tmp_path / "new"
+            new.symlink_to(device.port)
+            os.replace(new, link)
+        return step
+
+    with FakeDevice() as first, FakeDevice() as second:
+        def unplug():
+            connect(second)()  # Plugged in again under the same name
+            first.close()
+
+        # The port does not exist at first, then fails after a swipe
+        play(first, [(0.1, connect(first)), (0.2, first.encode_swipe(BITS)), (0.2, unplug)])
+        play(second, [(0.8, second.encode_swipe(BITS))])
+        reader = basereader.AsyncSerialReader(str(link), 9600, reconnect_delay=0.05)
+        assert read_swipes(reader, 2) == [BITS, BITS]
+        assert any(message.startswith("Can't open") for message in caplog.messages)
+        assert any(message.startswith("Error reading") for message in caplog.messages)
+
+
+def bits_frame(bitstring: str) -> bytes:
+    return basereader.encode_bits(BitBuffer.from_str(bitstring))
+
+
+def test_binary_frames():
+    with FakeDevice("binary") as device:
+        swipe = device.encode_swipe(BitBuffer.from_str(BITS))
+        play(device, [(0.1, swipe), (0.05, swipe)])
+        reader = basereader.AsyncSerialReader(device.port, 9600, protocol="binary")
+        assert read_swipes(reader, 2) == [BITS, BITS]
+
+
+def test_binary_frame_crc_mismatch(caplog):
+    with FakeDevice("binary") as device:
+        damaged = bytearray(bits_frame(BITS[::-1]))
+        damaged[-3] ^= 0x10  # A payload byte
+        play(device, [(0.1, bytes(damaged)), (0.05, bits_frame(BITS))])
+        reader = basereader.AsyncSerialReader(device.port, 9600, protocol="binary")
+        assert read_swipes(reader, 1) == [BITS]
+        assert "Frame CRC mismatch, skipping" in caplog.messages
+
+
+def test_binary_frame_split_across_reads():
+    with FakeDevice("binary") as device:
+        frame = bits_frame(BITS)
+        steps = [(0.1, frame[:3]), (0.1, frame[3:9]), (0.1, frame[9:])]  # Header, then payload, split
+        play(device, steps)
+        reader = basereader.AsyncSerialReader(device.port, 9600, protocol="binary")
+        assert read_swipes(reader, 1) == [BITS]
+
+
+def test_binary_resync_after_garbage():
+    with FakeDevice("binary") as device:
+        # Line noise, with magic bytes that start no valid frame
+        garbage = b"\x00\xff" + bytes([basereader.FRAME_MAGIC, 7]) + b"noise" + bytes([basereader.FRAME_MAGIC])
+        play(device, [(0.1, garbage), (0.05, device.encode_swipe(BitBuffer.from_str(BITS)))])
+        reader = basereader.AsyncSerialReader(device.port, 9600, protocol="binary")
+        assert read_swipes(reader, 1) == [BITS]
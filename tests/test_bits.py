@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from rawreader.bits import BitBuffer
+
+PATTERNS = ("11010", "010001", "1", "0", "0101010101")
+
+
+def bitstrings(count: int = 500):
+    """Yields random bitstrings and a slice of each, as string and view."""
+    rnd = random.Random(6)
+    for _ in range(count):
+        bits = "".join(rnd.choice("01") for _ in range(rnd.randint(0, 300)))
+        start = rnd.randint(0, len(bits))
+        stop = rnd.randint(start, len(bits))
+        yield (rnd, bits, bits[start:stop], BitBuffer.from_str(bits)[start:stop])
+
+
+def test_find():
+    for (rnd, _, bits, view) in bitstrings():
+        for pattern in PATTERNS + (bits[:9] or "1",):
+            start = rnd.randint(0, len(bits))
+            assert view.find(pattern, start) == bits.find(pattern, start)
+            assert view.find(BitBuffer.from_str(pattern)) == bits.find(pattern)
+            expected = []
+            pos = bits.find(pattern, start)
+            while pos >= 0:
+                expected.append(pos)
+                pos = bits.find(pattern, pos + 1)
+            assert list(view.find_all(pattern, start)) == expected
+
+
+def test_reversed_and_slices():
+    for (_, whole, bits, view) in bitstrings():
+        assert str(view.reversed()) == bits[::-1]
+        buf = BitBuffer.from_str(whole)
+        for step in (-1, 2, -3):
+            assert str(buf[::step]) == whole[::step]
+        assert list(view) == [int(bit) for bit in bits]
+
+
+def test_compare_with_bitstring():
+    for (_, _, bits, view) in bitstrings():
+        assert view == bits
+        assert view != bits + "0"
+        assert (view == bits.replace("0", "2")) == ("0" not in bits)
+
+
+def test_extend():
+    for (_, _, bits, view) in bitstrings():
+        buf = BitBuffer.from_str(bits[:7])
+        buf.extend(view)
+        buf.extend(bits)
+        buf.extend([1, 0, "1"])
+        assert str(buf) == bits[:7] + bits + bits + "101"
+
+
+@pytest.mark.parametrize("bitstring", ["1_0", "-1", "+1", "0b1", " 101", "1012", "1 0"])
+def test_from_str_rejects_non_bits(bitstring):
+    with pytest.raises(ValueError):
+        BitBuffer.from_str(bitstring)
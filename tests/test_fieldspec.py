@@ -0,0 +1,148 @@
+import random
+import re
+
+import pytest
+
+from decoder import bahn, girocard, iso4909
+from decoder.fieldspec import FieldError
+from decoder.raw import iso7813
+
+TRACKS = 10000  # Per format, half of them mutated
+DIGITS = "0123456789"
+
+# The patterns the formats were parsed with before the field specs, the ISO 4909
+# country code without its separator
+REGEXES = {
+    "iso7813-1": r"^%(?P<FC>[A-Z])(?P<PAN>[0-9]{1,19})\^(?P<CC>[0-9]{3})?(?P<NM>[^\^]{2,26})\^(?P<ED>[0-9]{4}|\^)"
+                 r"(?P<SC>[0-9]{3}|\^)(?P<PVV>[0-9]{5})(?P<DD>[^\?]*)\?$",
+    "iso7813-2": r"^\;(?P<PAN>[0-9]{1,19})\=(?P<ED>[0-9]{4}|\=)(?P<SC>[0-9]{3}|\=)(?P<PVV>[0-9]{5})(?P<DD>[^\?]*)\?$",
+    "bahn-1": r"^%(?P<FC>[A-Z])(?P<BCNR>[0-9]{1,19})\^(?P<VS>[0-9]{8})\^(?P<VE>[0-9]{8})\^(?P<MARK>[^\^]{1,})\^"
+              r"(?P<AD>[^\?]*)\?$",
+    "bahn-2": r"^\;(?P<BCNR>[0-9]{1,19})\=(?P<VS>[0-9]{8})\=(?P<VE>[0-9]{8})(?P<AD>[^\?]*)\?$",
+    "iso4909-3": r"^\;(?P<FC>[0-9]{2})(?P<PAN>[0-9]{1,19})?\=(?P<CC>[0-9]{3})\=(?P<CuC>[0-9]{3})(?P<CE>[0-9]{5})"
+                 r"(?P<AA>[0-9]{4})(?P<AR>[0-9]{4})(?P<CB>[0-9]{4})(?P<CL>[0-9]{2})(?P<RC>[0-9]{1})"
+                 r"(?P<PINCP>[0-9]{6}|\=)(?P<IC>[0-9]{1})(?P<PANSR>[0-9]{2})(?P<FSANSR>[0-9]{2})(?P<SSANSR>[0-9]{2})"
+                 r"(?P<ED>[0-9]{4}|\=)(?P<CSN>[0-9]{1})(?P<CScN>[0-9]{9}|\=)(?P<FSAN>[0-9]*)\=(?P<SSAN>[0-9]*)\="
+                 r"(?P<RM>[0-9]{1})(?P<CCD>[0-9]{6}|\=)(?P<AD>[^\?]*)\?$",
+}
+SPECS = {
+    "iso7813-1": iso7813.TRACK1_FORMAT,
+    "iso7813-2": iso7813.TRACK2_FORMAT,
+    "bahn-1": bahn.TRACK1_FORMAT,
+    "bahn-2": bahn.TRACK2_FORMAT,
+    "iso4909-3": iso4909.TRACK3_FORMAT,
+}
+
+
+def digits(rnd: random.Random, low: int, high: int) -> str:
+    return "".join(rnd.choice(DIGITS) for _ in range(rnd.randint(low, high)))
+
+
+def either(rnd: random.Random, marker: str, value: str) -> str:
+    return rnd.choice((marker, value))
+
+
+GENERATORS = {
+    "iso7813-1": lambda r: (f"%B{digits(r, 12, 20)}^{either(r, '', digits(r, 3, 3))}"
+                            f"{r.choice(['DOE/JOHN.MR', '123 AB', 'X', 'SMITH/J'])}^{either(r, '^', digits(r, 4, 4))}"
+                            f"{either(r, '^', digits(r, 3, 3))}{digits(r, 5, 5)}{digits(r, 0, 8)}?"),
+    "iso7813-2": lambda r: (f";{digits(r, 12, 20)}={either(r, '=', digits(r, 4, 4))}{either(r, '=', digits(r, 3, 3))}"
+                            f"{digits(r, 4, 6)}{digits(r, 0, 8)}?"),
+    "bahn-1": lambda r: (f"%B{digits(r, 14, 20)}^{digits(r, 8, 8)}^{digits(r, 7, 8)}^{r.choice(['HK', 'PK', ''])}^"
+                         f"{digits(r, 0, 5)}?"),
+    "bahn-2": lambda r: f";{digits(r, 14, 20)}={digits(r, 8, 8)}={digits(r, 7, 8)}{digits(r, 0, 5)}?",
+    "iso4909-3": lambda r: (f";{digits(r, 2, 2)}{digits(r, 0, 20)}={digits(r, 3, 3)}={digits(r, 3, 3)}"
+                            f"{digits(r, 5, 5)}{digits(r, 20, 20)}{either(r, '=', digits(r, 6, 6))}{digits(r, 7, 7)}"
+                            f"{either(r, '=', digits(r, 4, 4))}{digits(r, 1, 1)}{either(r, '=', digits(r, 9, 9))}"
+                            f"{digits(r, 0, 5)}={digits(r, 0, 5)}={digits(r, 1, 1)}{either(r, '=', digits(r, 6, 6))}"
+                            f"{digits(r, 0, 4)}?"),
+}
+
+
+def mutate(rnd: random.Random, data: str) -> str:
+    """Replaces, drops or inserts up to two characters."""
+    data = list(data)
+    for _ in range(rnd.randint(1, 2)):
+        i = rnd.randrange(len(data))
+        op = rnd.randrange(3)
+        if op == 0:
+            data[i] = rnd.choice(DIGITS + "=^?")
+        elif op == 1:
+            del data[i]
+        else:
+            data.insert(i, rnd.choice(DIGITS + "="))
+    return "".join(data)
+
+
+@pytest.mark.parametrize("name", sorted(SPECS))
+def test_same_as_regex(name):
+    rnd = random.Random(name)
+    regex = re.compile(REGEXES[name])
+    spec = SPECS[name]
+    for i in range(TRACKS):
+        data = GENERATORS[name](rnd)
+        if i % 2:
+            data = mutate(rnd, data)
+        matcher = regex.match(data)
+        try:
+            record = spec.parse(data)
+        except FieldError:
+            assert matcher is None, data
+            continue
+        assert matcher is not None, data
+        assert matcher.groupdict() == {key: record[key] for key in matcher.groupdict()}, data
+
+
+GIROCARD_FIELDS = (("FC", 2), ("MII", 2), ("BLZ", 8), "=", ("KTO", 10), ("CHK", 1), "=", ("CC", 3), ("CuC", 3),
+                   ("CE", 1), ("AA", 4), ("AR", 4), ("CB", 4), ("CL", 2), ("RC", 1), ("PINCP", 6), ("IC", 1),
+                   ("PANSR", 2), ("FSANSR", 2), ("SSANSR", 2), ("ED", 4), ("CSN", 1))
+
+
+def girocard_track(rnd: random.Random) -> tuple:
+    """Returns the data and fields of a girocard track 3. The subsidiary
+    account numbers, the relay marker and the crypto check digit are only
+    told apart by the markers, the combinations without them are skipped.
+    """
+    fields = {}
+    data = ";"
+    for field in GIROCARD_FIELDS:
+        if field == "=":
+            data += field
+            continue
+        fields[field[0]] = digits(rnd, field[1], field[1])
+        data += fields[field[0]]
+    fields["CScN"] = either(rnd, "=", digits(rnd, 9, 9))
+    fields["FSAN"] = either(rnd, "=", digits(rnd, 1, 6))
+    fields["SSAN"] = "=" if fields["FSAN"] != "=" else either(rnd, "=", digits(rnd, 0, 6))
+    fields["RM"] = digits(rnd, 1, 1)
+    fields["CCD"] = "=" if fields["SSAN"] != "=" else either(rnd, "=", digits(rnd, 6, 6))
+    fields["AD"] = digits(rnd, 0, 4)
+    data += "".join(fields[name] for name in ("CScN", "FSAN", "SSAN", "RM", "CCD", "AD")) + "?"
+    return (data, fields)
+
+
+def test_girocard_fields():
+    rnd = random.Random("girocard")
+    for _ in range(TRACKS):
+        (data, fields) = girocard_track(rnd)
+        record = girocard.TRACK3_FORMAT.parse(data)
+        assert fields == {key: record[key] for key in fields}, data
+
+
+def test_optional_field_left_to_next_field():
+    record = iso7813.TRACK1_FORMAT.parse("%B4111111111111111^123A^2512101123450000?")
+    assert (record["CC"], record["NM"]) == (None, "123A")
+    record = iso7813.TRACK1_FORMAT.parse("%B4111111111111111^276DOE/JOHN^2512101123450000?")
+    assert (record["CC"], record["NM"]) == ("276", "DOE/JOHN")
+
+
+@pytest.mark.parametrize(("data", "position", "field"), [
+    (";4111111111111111=2512101123X5000?", 25, "PVV"),
+    (";4111111111111111=251210112345000", 33, "Separator"),
+    (";4111111111111111=2512101123450?00?", 32, "Data"),
+    (";41111111111111111111111=2512101123450000?", 20, "Separator"),
+])
+def test_error_position(data, position, field):
+    with pytest.raises(FieldError) as error:
+        iso7813.TRACK2_FORMAT.parse(data)
+    assert (error.value.position, error.value.field) == (position, field)
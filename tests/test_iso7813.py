@@ -0,0 +1,102 @@
+import random
+
+from decoder.raw import iso7813
+from rawreader.bits import BitBuffer
+
+from tracks import CLOCKING, TRACK2, encode, flip
+
+SYMBOL = 5  # Bits per track 2 symbol
+
+
+def decode(bitstring: str, trackno: int = 2, slip_recovery: bool = False) -> iso7813.TrackData:
+    return iso7813.Decoder(trackno, slip_recovery).decode_bitstring(bitstring)[trackno - 1]
+
+
+def random_track2(rnd: random.Random) -> str:
+    digits = "".join(rnd.choice("0123456789") for _ in range(28))
+    return f";{digits[:16]}=2512101{digits[16:]}?"
+
+
+def test_valid_track():
+    track = decode(encode(TRACK2))
+    assert track == TRACK2
+    assert (track.lrc_ok, track.corrected, track.valid) == (True, False, True)
+
+
+def test_reverse_swipe():
+    track = decode(encode(TRACK2)[::-1])
+    assert track == TRACK2
+    assert track.valid
+
+
+def test_reverse_swipe_starting_with_short_track():
+    # Reversed, the LRC and the last two symbols read as ';', '?' and a matching LRC
+    data = ";4111761396341019=25121011234000004?"
+    bitstring = encode(data)[::-1]
+    assert bitstring[len(CLOCKING):len(CLOCKING) + 3 * SYMBOL] == "11010" "11111" "00100"
+    track = decode(bitstring)
+    assert track == data
+    assert track.valid
+    stream = iso7813.StreamDecoder(2)
+    stream.feed(bitstring)
+    assert stream.finish()[1] == data
+
+
+def test_forward_swipe_is_not_reversed(monkeypatch):
+    def reversed(self):
+        raise AssertionError("Reversed a forward swipe")
+
+    monkeypatch.setattr(BitBuffer, "reversed", reversed)
+    assert decode(encode(TRACK2)) == TRACK2
+
+
+def test_corrected_symbol_is_not_verified():
+    bitstring = flip(encode(TRACK2), len(CLOCKING) + 5 * SYMBOL + 1)
+    track = decode(bitstring)
+    assert track == TRACK2
+    assert track.corrected
+    assert track.lrc_ok is None
+    assert not track.valid
+
+
+def test_error_parity_misses_is_not_hidden_by_correction():
+    # Two flipped bits keep the parity of a symbol, a third one is repaired
+    offset = len(CLOCKING)
+    bitstring = flip(encode(TRACK2), offset + 3 * SYMBOL + 1, offset + 3 * SYMBOL + 2, offset + 8 * SYMBOL + 1)
+    track = decode(bitstring)
+    assert track != TRACK2
+    assert track.corrected
+    assert not track.valid
+
+
+def test_lrc_mismatch():
+    offset = len(CLOCKING)
+    track = decode(flip(encode(TRACK2), offset + 3 * SYMBOL + 1, offset + 3 * SYMBOL + 2))
+    assert track.lrc_ok is False
+    assert not track.valid
+
+
+def test_slip_recovery_keeps_lrc_repair():
+    # Reversed swipes with a flipped bit, the LRC repairs most of them
+    rnd = random.Random(10)
+    repaired = 0
+    for _ in range(300):
+        data = random_track2(rnd)
+        bitstring = flip(encode(data), len(CLOCKING) + rnd.randrange(SYMBOL, SYMBOL * (len(data) - 1)))[::-1]
+        if decode(bitstring) != data:
+            continue
+        repaired += 1
+        track = decode(bitstring, slip_recovery=True)
+        assert (track, track.slips) == (data, 0)
+    assert repaired > 200
+
+
+def test_slip_recovery_realigns_dropped_bit():
+    data = ";4929123456789012=25121017364582910?"  # No runs, the slip is not ambiguous
+    bitstring = encode(data)
+    pos = len(CLOCKING) + 10 * SYMBOL + 2
+    bitstring = bitstring[:pos] + bitstring[pos + 1:]
+    assert decode(bitstring) != data
+    for bits in (bitstring, bitstring[::-1]):
+        track = decode(bits, slip_recovery=True)
+        assert (track, track.slips, track.valid) == (data, 1, False)
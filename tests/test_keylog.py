@@ -0,0 +1,26 @@
+import io
+
+import keyboard
+import pytest
+
+from decoder.plain import keylog
+
+
+def recording(events: list) -> bytes:
+    fh = io.BytesIO()
+    keylog.write_events(fh, events)
+    return fh.getvalue()
+
+
+def test_round_trip():
+    events = [keyboard.KeyboardEvent(keyboard.KEY_DOWN, 39, name=";", time=100.0),
+              keyboard.KeyboardEvent(keyboard.KEY_UP, 39, name=";", time=100.25)]
+    read = keylog.read_events(io.BytesIO(recording(events)))
+    assert [(e.event_type, e.scan_code, e.name, e.time) for e in read] == \
+        [(e.event_type, e.scan_code, e.name, e.time) for e in events]
+
+
+@pytest.mark.parametrize("data", [keylog.MAGIC, b"MSRX" + bytes(keylog.HEADER.size - 4)])
+def test_not_a_recording(data):
+    with pytest.raises(ValueError):
+        keylog.read_events(io.BytesIO(data))
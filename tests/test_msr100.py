@@ -0,0 +1,47 @@
+import keyboard
+
+from decoder.plain import msr100
+
+TRACK2 = ";4111111111111111=25121011234000000?"
+TRACK3 = ";011234567890123456=724724100000000000030300XXXX040400099010=************************==1=0000000000000000?"
+KEY_GAP = 0.01  # Seconds between the key events of a swipe
+
+
+def swipe_events(lines: list, start: float) -> list:
+    """Returns the key events the reader types for the lines, named by
+    character like the hook reports them.
+    """
+    events = []
+    t = start
+    for line in lines:
+        for name in list(line) + ["enter"]:
+            for event_type in (keyboard.KEY_DOWN, keyboard.KEY_UP):
+                events.append(keyboard.KeyboardEvent(event_type, 0, name=name, time=t))
+                t += KEY_GAP
+    return events
+
+
+def read_swipes(events: list, swipe_timeout: float = msr100.SWIPE_TIMEOUT) -> list:
+    decoder = msr100.Decoder(source=msr100.FakeSource(events), swipe_timeout=swipe_timeout)
+    return list(decoder.read_swipes())
+
+
+def test_assembles_tracks():
+    assert read_swipes(swipe_events([TRACK2, TRACK3], 0)) == [(None, TRACK2, TRACK3)]
+
+
+def test_timeout_ends_swipe():
+    first = swipe_events([TRACK2], 0)
+    second = swipe_events([TRACK3], first[-1].time + 2 * msr100.SWIPE_TIMEOUT)
+    assert read_swipes(first + second) == [(None, TRACK2, None), (None, None, TRACK3)]
+
+
+def test_pause_within_timeout_continues_swipe():
+    first = swipe_events([TRACK2], 0)
+    second = swipe_events([TRACK3], first[-1].time + msr100.SWIPE_TIMEOUT / 2)
+    assert read_swipes(first + second) == [(None, TRACK2, TRACK3)]
+
+
+def test_unterminated_last_line():
+    events = swipe_events([TRACK2], 0)[:-2]  # Without the enter
+    assert read_swipes(events) == [(None, TRACK2, None)]
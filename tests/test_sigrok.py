@@ -0,0 +1,28 @@
+import io
+
+import pytest
+
+from rawreader import sigrok
+
+from tracks import TRACK2, encode
+
+BITS = encode(TRACK2)
+
+
+def sigrok_csv(bits: str) -> str:
+    """Returns a sigrok-cli csv export of a swipe of the bits, the card in
+    the head from the first sample, with the comment lines sigrok-cli writes
+    before the header.
+    """
+    lines = ["; CSV, generated by sigrok-cli", "; Channels (4/4): CRD, RCP, RDP, X", "CRD,RCP,RDP,X"]
+    for bit in bits:
+        data = "0" if bit == "1" else "1"  # Negative logic
+        lines += [f"0,1,{data},0", f"0,0,{data},0"]
+    lines += ["1,1,1,0"]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize("reader", [sigrok.NumpyCsvReader, sigrok.StreamCsvReader])
+def test_skips_comment_lines(reader):
+    pytest.importorskip("numpy")
+    assert str(reader(io.StringIO(sigrok_csv(BITS))).read_input()) == BITS
@@ -0,0 +1,30 @@
+"""Encodes track data into the bitstrings a reader head sees, for tests."""
+from decoder.raw.iso7813 import SYMBOLS_5, SYMBOLS_7
+
+TRACK2 = ";4111111111111111=25121011234000000?"
+CLOCKING = "0" * 20  # Leading and trailing zeros of a swipe
+
+
+def symbols(data: str, symbol_len: int = 5) -> list:
+    """Returns the symbols of the data, followed by its LRC."""
+    table = SYMBOLS_7 if symbol_len == 7 else SYMBOLS_5
+    codes = {char: symbol for (symbol, (char, parity_ok)) in enumerate(table) if parity_ok}
+    result = [codes[char] for char in data]
+    lrc = 0
+    for symbol in result:
+        lrc ^= symbol >> 1
+    return result + [(lrc << 1) | (lrc.bit_count() % 2 == 0)]
+
+
+def encode(data: str, symbol_len: int = 5) -> str:
+    """Returns the bitstring of a forward swipe of the track data."""
+    bits = "".join(format(symbol, f"0{symbol_len}b") for symbol in symbols(data, symbol_len))
+    return CLOCKING + bits + CLOCKING
+
+
+def flip(bitstring: str, *positions: int) -> str:
+    """Returns the bitstring with the bits at the positions inverted."""
+    bits = list(bitstring)
+    for pos in positions:
+        bits[pos] = "1" if bits[pos] == "0" else "0"
+    return "".join(bits)